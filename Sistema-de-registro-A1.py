@@ -1,12 +1,1270 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import sqlite3
-import cv2
-from PIL import Image, ImageTk
-from pyzbar.pyzbar import decode
+from PIL import Image, ImageDraw, ImageFont, ImageOps, ImageTk
 import os
 import io
-from datetime import datetime
+import re
+import csv
+import sys
+import json
+import hashlib
+import queue
+import random
+import argparse
+import itertools
+import threading
+import time
+import heapq
+import contextlib
+import functools
+import tempfile
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+# Configuración del lector: la vista previa y la decodificación corren a ritmos independientes
+FPS_VISTA_PREVIA = 30
+FRECUENCIA_PANTALLA = 60            # Hz; la vista previa nunca se dibuja más rápido que esto
+DECODIFICACIONES_POR_SEGUNDO = 10
+TAMANO_VIDEO = (480, 360)
+
+# Cámara: formato negociado en el dispositivo y recuperación ante desconexiones
+FUENTE_CAMARA = 0                   # Índice del dispositivo o ruta de un video
+FPS_CAMARA = 30
+USAR_MJPEG = True
+MAX_FALLOS_LECTURA = 30             # Lecturas fallidas seguidas antes de reabrir el dispositivo
+ESPERA_MAXIMA_RECONEXION = 5.0      # Segundos máximos entre intentos de reapertura
+
+# Cámaras de las puertas: nombre visible -> índice del dispositivo o ruta de video
+CAMARAS = {
+    "Puerta principal": FUENTE_CAMARA
+}
+PROCESOS_DECODIFICACION = None      # None: uno por núcleo (solo con más de una cámara)
+VENTANA_ORDEN_MS = 200              # Retraso para entregar en orden los eventos de varias cámaras
+
+# Decodificador de códigos: 'pyzbar' (QR y códigos de barras) u 'opencv' (solo QR)
+DECODIFICADOR = 'pyzbar'
+
+# Planificación adaptativa del escaneo
+UMBRAL_DIFERENCIA = 25              # Diferencia mínima de intensidad para contar un píxel como cambiado
+UMBRAL_MOVIMIENTO = 0.005           # Fracción de píxeles cambiados para considerar que hubo movimiento
+ESCALA_MOVIMIENTO = 4               # Reducción aplicada antes de comparar frames
+MARGEN_REGION = 40                  # Píxeles añadidos alrededor de la región de interés
+INTERVALO_ESCANEO_COMPLETO = 1.0    # Segundos entre escaneos completos de respaldo
+
+# Antirrebote de lecturas: un evento por código cada ESPERA_ENTRE_LECTURAS segundos
+ESPERA_ENTRE_LECTURAS = 5.0
+MAX_CODIGOS_RECIENTES = 1024
+
+# Escritura por lotes de eventos de entrada/salida
+INTERVALO_ESCRITURA_MS = 500        # Tiempo máximo que un evento espera antes de guardarse
+MAX_EVENTOS_LOTE = 200              # Eventos que fuerzan un volcado inmediato
+
+# Resúmenes diarios de asistencia: eventos incorporados por transacción al ponerse al día
+TAMANO_LOTE_RESUMEN = 5000
+
+RUTA_BASE_DATOS = 'registro_escolar.db'
+
+# Consultas fuera del hilo de Tk: cada cuánto se revisan los resultados pendientes
+INTERVALO_RESULTADOS_MS = 15
+
+# Ingesta de fotografías: se decodifican una vez, se reducen y se recodifican antes de guardarse
+LADO_MAXIMO_FOTO = 1024
+FORMATO_FOTO = 'JPEG'               # 'JPEG' o 'WEBP'
+CALIDAD_FOTO = 85
+TAMANO_VISTA_PREVIA = (150, 150)
+
+# Miniaturas generadas al registrar una fotografía (lado máximo en píxeles)
+TAMANOS_MINIATURA = (64, 150)
+CALIDAD_MINIATURA = 85
+
+# Perfiles de configuración de SQLite (ver GestorConexiones)
+PERFILES_SQLITE = {
+    # Valores por defecto de SQLite: diario de reversión, sin ajustes
+    'clasico': {},
+    # WAL con sincronización completa: ningún commit se pierde ante un corte de luz
+    'seguro': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -8000,
+        'temp_store': 'MEMORY'
+    },
+    # WAL con sincronización normal: solo se sincroniza en los checkpoints
+    'equilibrado': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -32000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY'
+    },
+    # Sin sincronización: solo para cargas masivas que se pueden repetir
+    'maximo': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -64000,
+        'mmap_size': 1024 * 1024 * 1024,
+        'temp_store': 'MEMORY'
+    }
+}
+PERFIL_SQLITE = 'equilibrado'
+
+# Credenciales QR: caché de imágenes y hojas imprimibles
+MAX_QR_EN_CACHE = 512
+CREDENCIALES_POR_HOJA = (3, 4)      # Columnas y filas por hoja
+TAMANO_HOJA = (1240, 1754)          # A4 a 150 ppp
+LADO_QR_HOJA = 320
+
+# Importación masiva de alumnos
+TAMANO_LOTE_IMPORTACION = 500
+COLUMNAS_IMPORTACION = ("matricula", "nombre", "edad", "nivel", "grado", "grupo", "foto")
+
+# Exportación por bloques: la memoria no depende del número de filas
+TAMANO_BLOQUE_EXPORTACION = 1000
+FORMATOS_EXPORTACION = ('csv', 'jsonl', 'parquet')
+
+# Consulta paginada: solo la ventana visible vive en el Treeview
+TAMANO_PAGINA_CONSULTA = 100
+FILAS_VISIBLES_CONSULTA = 20
+MAX_PAGINAS_EN_MEMORIA = 10
+
+# Caché de resultados por combinación de filtros (ver CacheConsultas)
+MAX_CONSULTAS_EN_CACHE = 32
+MEMORIA_CACHE_CONSULTAS = 16 * 1024 * 1024     # Bytes aproximados
+SENTENCIAS_EN_CACHE = 256                       # Sentencias preparadas por conexión
+
+# Búsqueda por nombre o matrícula mientras se escribe
+MAX_RESULTADOS_BUSQUEDA = 500
+ESPERA_BUSQUEDA_MS = 150
+
+# Instrumentación de las rutas críticas (ver Metricas y PaginaDiagnostico)
+METRICAS_ACTIVAS = True
+MUESTRAS_METRICAS = 1000            # Duraciones recientes conservadas por métrica
+INTERVALO_VOLCADO_METRICAS = 60     # Segundos entre volcados a disco; 0 para no volcar
+RUTA_METRICAS = 'metricas'          # Se escriben metricas.json y metricas.prom
+
+# Los triggers check_grupo_limite de MIGRACIONES se generan con este valor al crear la base.
+# Una base ya migrada conserva el límite con el que se creó: cambiarlo requiere además un paso
+# de migración nuevo que vuelva a crear esos triggers
+LIMITE_GRUPO = 45
+GRUPOS = ['A', 'B', 'C', 'D', 'E']
+
+# Grados disponibles por nivel educativo
+GRADOS = {
+    "Preescolar": ["1er año", "2do año", "3er año"],
+    "Primaria": ["1er año", "2do año", "3er año", "4to año", "5to año", "6to año"],
+    "Secundaria": ["1er año", "2do año", "3er año"]
+}
+
+class _Cronometro:
+    __slots__ = ('metricas', 'nombre', 'inicio')
+
+    def __init__(self, metricas, nombre):
+        self.metricas = metricas
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metricas.registrar(self.nombre, (time.perf_counter() - self.inicio) * 1000)
+        return False
+
+# Un único objeto sin efecto para todas las mediciones cuando la instrumentación está apagada
+_SIN_MEDICION = contextlib.nullcontext()
+
+class Metricas:
+    """Duraciones y contadores de las rutas críticas, compartidos entre hilos.
+
+    Desactivadas, medir() devuelve siempre el mismo objeto vacío y contar() no hace nada.
+    """
+
+    def __init__(self, activas=METRICAS_ACTIVAS, muestras=MUESTRAS_METRICAS):
+        self.activas = activas
+        self.muestras = muestras
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.inicio = time.monotonic()
+            self._tiempos = {}
+            self._totales = {}
+            self._sumas = {}
+            self._contadores = {}
+
+    def medir(self, nombre):
+        """Context manager que registra la duración del bloque en milisegundos"""
+        if not self.activas:
+            return _SIN_MEDICION
+        return _Cronometro(self, nombre)
+
+    def registrar(self, nombre, ms):
+        if not self.activas:
+            return
+        with self._lock:
+            tiempos = self._tiempos.get(nombre)
+            if tiempos is None:
+                tiempos = self._tiempos[nombre] = deque(maxlen=self.muestras)
+                self._totales[nombre] = 0
+                self._sumas[nombre] = 0.0
+            tiempos.append(ms)
+            self._totales[nombre] += 1
+            self._sumas[nombre] += ms
+
+    def contar(self, nombre, cantidad=1):
+        if not self.activas:
+            return
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + cantidad
+
+    def resumen(self):
+        """Percentiles de las muestras recientes y ritmo promedio desde el último reinicio"""
+        with self._lock:
+            tiempos = {nombre: list(muestras) for nombre, muestras in self._tiempos.items()}
+            totales = dict(self._totales)
+            sumas = dict(self._sumas)
+            contadores = dict(self._contadores)
+            transcurrido = max(time.monotonic() - self.inicio, 1e-9)
+
+        return {
+            'transcurrido_s': transcurrido,
+            'tiempos': {
+                nombre: {
+                    'conteo': totales[nombre],
+                    'suma_ms': sumas[nombre],
+                    'por_segundo': totales[nombre] / transcurrido,
+                    'p50_ms': percentil(muestras, 50),
+                    'p95_ms': percentil(muestras, 95),
+                    'p99_ms': percentil(muestras, 99)
+                }
+                for nombre, muestras in sorted(tiempos.items())
+            },
+            'contadores': {
+                nombre: {'total': total, 'por_segundo': total / transcurrido}
+                for nombre, total in sorted(contadores.items())
+            }
+        }
+
+    @staticmethod
+    def prometheus(resumen):
+        """Formato de texto de Prometheus: un summary por tiempo y un counter por contador"""
+        lineas = []
+        for nombre, datos in resumen['tiempos'].items():
+            metrica = "registro_" + re.sub(r'[^a-zA-Z0-9_]', '_', nombre) + "_ms"
+            lineas.append(f"# TYPE {metrica} summary")
+            for cuantil, clave in (("0.5", 'p50_ms'), ("0.95", 'p95_ms'), ("0.99", 'p99_ms')):
+                lineas.append(f'{metrica}{{quantile="{cuantil}"}} {datos[clave]:.3f}')
+            lineas.append(f"{metrica}_sum {datos['suma_ms']:.3f}")
+            lineas.append(f"{metrica}_count {datos['conteo']}")
+        for nombre, datos in resumen['contadores'].items():
+            metrica = "registro_" + re.sub(r'[^a-zA-Z0-9_]', '_', nombre) + "_total"
+            lineas.append(f"# TYPE {metrica} counter")
+            lineas.append(f"{metrica} {datos['total']}")
+        return "\n".join(lineas) + "\n"
+
+    def volcar(self, ruta=RUTA_METRICAS):
+        """Escribe ruta.json y ruta.prom; se reemplazan completos para no dejar archivos a medias"""
+        resumen = dict(self.resumen(), fecha=datetime.now().isoformat(timespec='seconds'))
+        for extension, contenido in (('.json', json.dumps(resumen, indent=2, ensure_ascii=False)),
+                                     ('.prom', self.prometheus(resumen))):
+            temporal = ruta + extension + '.tmp'
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, ruta + extension)
+
+METRICAS = Metricas()
+
+class VolcadorMetricas:
+    """Vuelca las métricas a disco cada cierto tiempo desde un hilo propio"""
+
+    def __init__(self, metricas=METRICAS, intervalo=INTERVALO_VOLCADO_METRICAS, ruta=RUTA_METRICAS):
+        self.metricas = metricas
+        self.intervalo = intervalo
+        self.ruta = ruta
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo is None and self.metricas.activas and self.intervalo > 0:
+            self._hilo = threading.Thread(target=self._bucle, daemon=True)
+            self._hilo.start()
+
+    def cerrar(self):
+        # Un último volcado para no perder el tramo final de la sesión
+        if self._hilo is not None:
+            self._detener.set()
+            self._hilo.join()
+            self._hilo = None
+            self._volcar()
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            self._volcar()
+
+    def _volcar(self):
+        try:
+            self.metricas.volcar(self.ruta)
+        except OSError as e:
+            print(f"Error al volcar métricas: {e}", file=sys.stderr)
+
+class AlmacenFotos:
+    """Fotografías direccionadas por contenido (SHA-256) fuera de la tabla alumnos"""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def guardar(self, datos):
+        """Guarda la foto y sus miniaturas si no existían; no confirma la transacción"""
+        foto_hash = hashlib.sha256(datos).hexdigest()
+        # Una foto repetida ya tiene sus miniaturas
+        if self.conexion.execute('SELECT 1 FROM fotos WHERE hash = ?', (foto_hash,)).fetchone():
+            return foto_hash
+
+        # Decodificar antes de insertar: una imagen ilegible no deja filas huérfanas en fotos
+        miniaturas = generar_miniaturas(datos)
+        self.conexion.execute('''
+            INSERT INTO fotos (hash, datos, tamano) VALUES (?, ?, ?)
+        ''', (foto_hash, datos, len(datos)))
+        self.conexion.executemany('''
+            INSERT OR IGNORE INTO miniaturas (hash, lado, datos) VALUES (?, ?, ?)
+        ''', [(foto_hash, lado, miniatura) for lado, miniatura in miniaturas.items()])
+        return foto_hash
+
+    def miniatura(self, foto_hash, lado=TAMANOS_MINIATURA[-1]):
+        fila = self.conexion.execute('''
+            SELECT datos FROM miniaturas WHERE hash = ? AND lado = ?
+        ''', (foto_hash, lado)).fetchone()
+        return fila[0] if fila else None
+
+    def original(self, foto_hash):
+        fila = self.conexion.execute('SELECT datos FROM fotos WHERE hash = ?',
+                                     (foto_hash,)).fetchone()
+        return fila[0] if fila else None
+
+def generar_miniaturas(datos):
+    """Devuelve {lado: bytes JPEG} para cada tamaño de TAMANOS_MINIATURA"""
+    imagen = Image.open(io.BytesIO(datos))
+    imagen = imagen.convert('RGB')
+    miniaturas = {}
+    for lado in sorted(TAMANOS_MINIATURA, reverse=True):
+        # Reducir a partir de la miniatura anterior, que ya es más pequeña que el original
+        imagen.thumbnail((lado, lado))
+        salida = io.BytesIO()
+        imagen.save(salida, format='JPEG', quality=CALIDAD_MINIATURA)
+        miniaturas[lado] = salida.getvalue()
+    return miniaturas
+
+class FotoProcesada:
+    """Resultado de procesar_foto: bytes listos para guardar y la vista previa del formulario"""
+
+    def __init__(self, datos, vista_previa, tamano_original):
+        self.datos = datos
+        self.vista_previa = vista_previa
+        self.tamano_original = tamano_original
+
+    def bytes_ahorrados(self):
+        return self.tamano_original - len(self.datos)
+
+def procesar_foto(ruta, lado_maximo=LADO_MAXIMO_FOTO, formato=FORMATO_FOTO, calidad=CALIDAD_FOTO):
+    """Decodifica la imagen una sola vez, corrige la orientación EXIF, la reduce y la recodifica"""
+    tamano_original = os.path.getsize(ruta)
+    with Image.open(ruta) as original:
+        imagen = ImageOps.exif_transpose(original)
+        imagen = imagen.convert('RGB')
+
+    imagen.thumbnail((lado_maximo, lado_maximo), Image.LANCZOS)
+    salida = io.BytesIO()
+    imagen.save(salida, format=formato, quality=calidad)
+
+    vista_previa = imagen.copy()
+    vista_previa.thumbnail(TAMANO_VISTA_PREVIA)
+    return FotoProcesada(salida.getvalue(), vista_previa, tamano_original)
+
+def _migrar_fotos_a_almacen(conexion):
+    conexion.execute('''
+        CREATE TABLE fotos (
+            hash TEXT PRIMARY KEY,
+            datos BLOB NOT NULL,
+            tamano INTEGER NOT NULL
+        )
+    ''')
+    conexion.execute('''
+        CREATE TABLE miniaturas (
+            hash TEXT REFERENCES fotos(hash),
+            lado INTEGER,
+            datos BLOB NOT NULL,
+            PRIMARY KEY (hash, lado)
+        )
+    ''')
+    conexion.execute('ALTER TABLE alumnos ADD COLUMN foto_hash TEXT REFERENCES fotos(hash)')
+
+    # Mover las fotos existentes; la columna fotografia queda en NULL por compatibilidad
+    almacen = AlmacenFotos(conexion)
+    ids = [fila[0] for fila in conexion.execute(
+        'SELECT id FROM alumnos WHERE fotografia IS NOT NULL')]
+    for alumno_id in ids:
+        datos = conexion.execute('SELECT fotografia FROM alumnos WHERE id = ?',
+                                 (alumno_id,)).fetchone()[0]
+        try:
+            foto_hash = almacen.guardar(datos)
+        except OSError:
+            # Imagen ilegible: se conserva en su lugar
+            continue
+        conexion.execute('''
+            UPDATE alumnos SET foto_hash = ?, fotografia = NULL WHERE id = ?
+        ''', (foto_hash, alumno_id))
+
+def _crear_indice_texto(conexion):
+    # Sin FTS5 compilado en SQLite la búsqueda usa LIKE como respaldo
+    try:
+        conexion.execute('''
+            CREATE VIRTUAL TABLE alumnos_fts USING fts5(
+                nombre,
+                matricula,
+                content='alumnos',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return
+
+    conexion.execute("INSERT INTO alumnos_fts(alumnos_fts) VALUES ('rebuild')")
+    conexion.execute('''
+        CREATE TRIGGER alumnos_fts_alta
+        AFTER INSERT ON alumnos
+        BEGIN
+            INSERT INTO alumnos_fts (rowid, nombre, matricula)
+            VALUES (NEW.id, NEW.nombre, NEW.matricula);
+        END
+    ''')
+    conexion.execute('''
+        CREATE TRIGGER alumnos_fts_baja
+        AFTER DELETE ON alumnos
+        BEGIN
+            INSERT INTO alumnos_fts (alumnos_fts, rowid, nombre, matricula)
+            VALUES ('delete', OLD.id, OLD.nombre, OLD.matricula);
+        END
+    ''')
+    conexion.execute('''
+        CREATE TRIGGER alumnos_fts_cambio
+        AFTER UPDATE OF nombre, matricula ON alumnos
+        BEGIN
+            INSERT INTO alumnos_fts (alumnos_fts, rowid, nombre, matricula)
+            VALUES ('delete', OLD.id, OLD.nombre, OLD.matricula);
+            INSERT INTO alumnos_fts (rowid, nombre, matricula)
+            VALUES (NEW.id, NEW.nombre, NEW.matricula);
+        END
+    ''')
+
+def expresion_busqueda(texto):
+    """Convierte lo escrito en una consulta FTS5: cada palabra como prefijo, todas requeridas"""
+    palabras = re.findall(r"\w+", texto)
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+# Migraciones del esquema. Cada paso se aplica una sola vez y su posición en la
+# lista (empezando en 1) es la versión que queda guardada en PRAGMA user_version.
+# Un paso puede ser un script SQL o una función que recibe la conexión.
+# Nunca modificar un paso ya publicado: agregar uno nuevo al final.
+MIGRACIONES = [
+    # 1: esquema inicial
+    f'''
+    CREATE TABLE IF NOT EXISTS alumnos (
+        id INTEGER PRIMARY KEY,
+        matricula TEXT UNIQUE,
+        nombre TEXT,
+        edad INTEGER,
+        nivel TEXT,
+        grado TEXT,
+        grupo TEXT,
+        codigo_barras TEXT UNIQUE,
+        fotografia BLOB,
+        fecha_registro DATETIME
+    );
+
+    CREATE TABLE IF NOT EXISTS registro_entrada_salida (
+        id INTEGER PRIMARY KEY,
+        alumno_id INTEGER,
+        fecha_hora DATETIME,
+        tipo TEXT,
+        FOREIGN KEY (alumno_id) REFERENCES alumnos(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_alumno_nivel
+    ON alumnos(nivel);
+
+    CREATE INDEX IF NOT EXISTS idx_alumno_grupo
+    ON alumnos(nivel, grado, grupo);
+
+    CREATE INDEX IF NOT EXISTS idx_registro_alumno
+    ON registro_entrada_salida(alumno_id);
+
+    CREATE INDEX IF NOT EXISTS idx_registro_fecha
+    ON registro_entrada_salida(fecha_hora);
+
+    CREATE VIEW IF NOT EXISTS view_alumnos_por_grupo AS
+    SELECT nivel, grado, grupo, COUNT(*) as total_alumnos
+    FROM alumnos
+    GROUP BY nivel, grado, grupo;
+
+    CREATE TRIGGER IF NOT EXISTS check_grupo_limite
+    BEFORE INSERT ON alumnos
+    BEGIN
+        SELECT CASE
+            WHEN (
+                SELECT COUNT(*)
+                FROM alumnos
+                WHERE nivel = NEW.nivel
+                AND grado = NEW.grado
+                AND grupo = NEW.grupo
+            ) >= {LIMITE_GRUPO}
+            THEN RAISE(ABORT, 'El grupo ha alcanzado el límite máximo de {LIMITE_GRUPO} alumnos')
+        END;
+    END;
+    ''',
+
+    # 2: fotografías en un almacén aparte con miniaturas pregeneradas
+    _migrar_fotos_a_almacen,
+
+    # 3: contador de ocupación por grupo mantenido por triggers
+    f'''
+    CREATE TABLE grupo_ocupacion (
+        nivel TEXT,
+        grado TEXT,
+        grupo TEXT,
+        total INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (nivel, grado, grupo)
+    ) WITHOUT ROWID;
+
+    INSERT INTO grupo_ocupacion (nivel, grado, grupo, total)
+    SELECT nivel, grado, grupo, COUNT(*)
+    FROM alumnos
+    GROUP BY nivel, grado, grupo;
+
+    DROP TRIGGER IF EXISTS check_grupo_limite;
+
+    CREATE TRIGGER check_grupo_limite
+    BEFORE INSERT ON alumnos
+    BEGIN
+        SELECT RAISE(ABORT, 'El grupo ha alcanzado el límite máximo de {LIMITE_GRUPO} alumnos')
+        WHERE (
+            SELECT total FROM grupo_ocupacion
+            WHERE nivel = NEW.nivel AND grado = NEW.grado AND grupo = NEW.grupo
+        ) >= {LIMITE_GRUPO};
+    END;
+
+    CREATE TRIGGER check_grupo_limite_cambio
+    BEFORE UPDATE OF nivel, grado, grupo ON alumnos
+    WHEN NEW.nivel IS NOT OLD.nivel OR NEW.grado IS NOT OLD.grado OR NEW.grupo IS NOT OLD.grupo
+    BEGIN
+        SELECT RAISE(ABORT, 'El grupo ha alcanzado el límite máximo de {LIMITE_GRUPO} alumnos')
+        WHERE (
+            SELECT total FROM grupo_ocupacion
+            WHERE nivel = NEW.nivel AND grado = NEW.grado AND grupo = NEW.grupo
+        ) >= {LIMITE_GRUPO};
+    END;
+
+    CREATE TRIGGER grupo_ocupacion_alta
+    AFTER INSERT ON alumnos
+    BEGIN
+        INSERT INTO grupo_ocupacion (nivel, grado, grupo, total)
+        VALUES (NEW.nivel, NEW.grado, NEW.grupo, 1)
+        ON CONFLICT (nivel, grado, grupo) DO UPDATE SET total = total + 1;
+    END;
+
+    CREATE TRIGGER grupo_ocupacion_baja
+    AFTER DELETE ON alumnos
+    BEGIN
+        UPDATE grupo_ocupacion SET total = total - 1
+        WHERE nivel = OLD.nivel AND grado = OLD.grado AND grupo = OLD.grupo;
+    END;
+
+    CREATE TRIGGER grupo_ocupacion_cambio
+    AFTER UPDATE OF nivel, grado, grupo ON alumnos
+    WHEN NEW.nivel IS NOT OLD.nivel OR NEW.grado IS NOT OLD.grado OR NEW.grupo IS NOT OLD.grupo
+    BEGIN
+        UPDATE grupo_ocupacion SET total = total - 1
+        WHERE nivel = OLD.nivel AND grado = OLD.grado AND grupo = OLD.grupo;
+
+        INSERT INTO grupo_ocupacion (nivel, grado, grupo, total)
+        VALUES (NEW.nivel, NEW.grado, NEW.grupo, 1)
+        ON CONFLICT (nivel, grado, grupo) DO UPDATE SET total = total + 1;
+    END;
+
+    DROP VIEW IF EXISTS view_alumnos_por_grupo;
+
+    CREATE VIEW view_alumnos_por_grupo AS
+    SELECT nivel, grado, grupo, total AS total_alumnos
+    FROM grupo_ocupacion
+    WHERE total > 0;
+    ''',
+
+    # 4: índices que cubren el orden (nombre, id) de la consulta paginada
+    '''
+    CREATE INDEX idx_alumno_nivel_nombre
+    ON alumnos(nivel, nombre);
+
+    CREATE INDEX idx_alumno_grupo_nombre
+    ON alumnos(nivel, grado, grupo, nombre);
+    ''',
+
+    # 5: índice de texto completo sobre nombre y matrícula
+    _crear_indice_texto,
+
+    # 6: resúmenes diarios de asistencia mantenidos de forma incremental
+    '''
+    CREATE TABLE asistencia_diaria (
+        alumno_id INTEGER REFERENCES alumnos(id),
+        fecha TEXT,
+        primera_entrada TEXT,
+        ultima_salida TEXT,
+        segundos_en_plantel INTEGER NOT NULL DEFAULT 0,
+        entrada_abierta TEXT,
+        PRIMARY KEY (alumno_id, fecha)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX idx_asistencia_fecha
+    ON asistencia_diaria(fecha);
+
+    CREATE TABLE presencia_grupo_diaria (
+        fecha TEXT,
+        nivel TEXT,
+        grado TEXT,
+        grupo TEXT,
+        presentes INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (fecha, nivel, grado, grupo)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE marcas_resumen (
+        nombre TEXT PRIMARY KEY,
+        ultimo_id INTEGER NOT NULL
+    );
+
+    INSERT INTO marcas_resumen (nombre, ultimo_id) VALUES ('asistencia', 0);
+    ''',
+]
+
+def migrar_base_datos(conexion):
+    """Aplica las migraciones pendientes y devuelve [(version, segundos), ...]"""
+    version = conexion.execute("PRAGMA user_version").fetchone()[0]
+    tiempos = []
+
+    for numero, paso in enumerate(MIGRACIONES[version:], start=version + 1):
+        inicio = time.perf_counter()
+        try:
+            # El paso y el cambio de versión se confirman juntos o no se confirman
+            if callable(paso):
+                conexion.execute("BEGIN")
+                paso(conexion)
+                conexion.execute(f"PRAGMA user_version = {numero}")
+                conexion.commit()
+            else:
+                conexion.executescript(f"BEGIN;\n{paso}\nPRAGMA user_version = {numero};\nCOMMIT;")
+        except sqlite3.Error:
+            if conexion.in_transaction:
+                conexion.rollback()
+            raise
+        tiempos.append((numero, time.perf_counter() - inicio))
+
+    return tiempos
+
+def ocupacion_grupo(conexion, nivel, grado, grupo):
+    """Alumnos inscritos en el grupo, leído del contador mantenido por triggers"""
+    fila = conexion.execute('''
+        SELECT total FROM grupo_ocupacion WHERE nivel = ? AND grado = ? AND grupo = ?
+    ''', (nivel, grado, grupo)).fetchone()
+    return fila[0] if fila else 0
+
+def reconstruir_ocupacion(conexion):
+    """Recalcula grupo_ocupacion desde alumnos y devuelve los grupos que estaban desfasados"""
+    with conexion:
+        reales = {
+            (nivel, grado, grupo): total
+            for nivel, grado, grupo, total in conexion.execute('''
+                SELECT nivel, grado, grupo, COUNT(*) FROM alumnos GROUP BY nivel, grado, grupo
+            ''')
+        }
+        guardados = {
+            (nivel, grado, grupo): total
+            for nivel, grado, grupo, total in conexion.execute(
+                'SELECT nivel, grado, grupo, total FROM grupo_ocupacion')
+        }
+        diferencias = [(clave, guardados.get(clave, 0), reales.get(clave, 0))
+                       for clave in reales.keys() | guardados.keys()
+                       if guardados.get(clave, 0) != reales.get(clave, 0)]
+
+        conexion.execute('DELETE FROM grupo_ocupacion')
+        conexion.executemany('''
+            INSERT INTO grupo_ocupacion (nivel, grado, grupo, total) VALUES (?, ?, ?, ?)
+        ''', [clave + (total,) for clave, total in reales.items()])
+    return diferencias
+
+def _segundos_entre(desde, hasta):
+    return max(0, int((datetime.fromisoformat(hasta) - datetime.fromisoformat(desde)).total_seconds()))
+
+def _aplicar_eventos_asistencia(conexion, eventos):
+    # Cargar solo los días de los alumnos que aparecen en el lote
+    dias = {}
+    for _, alumno_id, fecha_hora, _, _, _, _ in eventos:
+        clave = (alumno_id, str(fecha_hora)[:10])
+        if clave not in dias:
+            fila = conexion.execute('''
+                SELECT primera_entrada, ultima_salida, segundos_en_plantel, entrada_abierta
+                FROM asistencia_diaria WHERE alumno_id = ? AND fecha = ?
+            ''', clave).fetchone()
+            dias[clave] = list(fila) if fila else None
+
+    presentes = {}
+    for _, alumno_id, fecha_hora, tipo, nivel, grado, grupo in eventos:
+        momento = str(fecha_hora)
+        clave = (alumno_id, momento[:10])
+        dia = dias[clave]
+        if dia is None:
+            # Primer evento del alumno en el día: cuenta como presente en su grupo
+            dia = dias[clave] = [None, None, 0, None]
+            if nivel is not None:
+                grupo_dia = (momento[:10], nivel, grado, grupo)
+                presentes[grupo_dia] = presentes.get(grupo_dia, 0) + 1
+
+        if tipo == 'entrada':
+            if dia[0] is None or momento < dia[0]:
+                dia[0] = momento
+            if dia[3] is None:
+                dia[3] = momento
+        elif tipo == 'salida':
+            if dia[1] is None or momento > dia[1]:
+                dia[1] = momento
+            if dia[3] is not None:
+                dia[2] += _segundos_entre(dia[3], momento)
+                dia[3] = None
+
+    conexion.executemany('''
+        INSERT INTO asistencia_diaria
+        (alumno_id, fecha, primera_entrada, ultima_salida, segundos_en_plantel, entrada_abierta)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (alumno_id, fecha) DO UPDATE SET
+            primera_entrada = excluded.primera_entrada,
+            ultima_salida = excluded.ultima_salida,
+            segundos_en_plantel = excluded.segundos_en_plantel,
+            entrada_abierta = excluded.entrada_abierta
+    ''', [clave + tuple(dia) for clave, dia in dias.items()])
+    conexion.executemany('''
+        INSERT INTO presencia_grupo_diaria (fecha, nivel, grado, grupo, presentes)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (fecha, nivel, grado, grupo) DO UPDATE SET presentes = presentes + excluded.presentes
+    ''', [clave + (total,) for clave, total in presentes.items()])
+
+def actualizar_resumenes(conexion, lote=TAMANO_LOTE_RESUMEN):
+    """Incorpora a los resúmenes diarios los eventos posteriores a la marca; devuelve cuántos.
+
+    Cada lote y el avance de la marca se confirman juntos: tras un corte basta con volver a llamarla.
+    """
+    total = 0
+    while True:
+        with METRICAS.medir('bd.resumen_asistencia'), conexion:
+            marca = conexion.execute(
+                "SELECT ultimo_id FROM marcas_resumen WHERE nombre = 'asistencia'").fetchone()[0]
+            eventos = conexion.execute('''
+                SELECT r.id, r.alumno_id, r.fecha_hora, r.tipo, a.nivel, a.grado, a.grupo
+                FROM registro_entrada_salida r
+                LEFT JOIN alumnos a ON a.id = r.alumno_id
+                WHERE r.id > ?
+                ORDER BY r.id
+                LIMIT ?
+            ''', (marca, lote)).fetchall()
+            if eventos:
+                _aplicar_eventos_asistencia(conexion, eventos)
+                conexion.execute('''
+                    UPDATE marcas_resumen SET ultimo_id = ? WHERE nombre = 'asistencia'
+                ''', (eventos[-1][0],))
+        total += len(eventos)
+        if len(eventos) < lote:
+            return total
+
+def reconstruir_resumenes(conexion):
+    """Descarta los resúmenes y los recalcula desde el registro completo de eventos"""
+    with conexion:
+        conexion.execute('DELETE FROM asistencia_diaria')
+        conexion.execute('DELETE FROM presencia_grupo_diaria')
+        conexion.execute("UPDATE marcas_resumen SET ultimo_id = 0 WHERE nombre = 'asistencia'")
+    return actualizar_resumenes(conexion)
+
+def presencia_por_grupo(conexion, fecha):
+    """[(nivel, grado, grupo, presentes, inscritos), ...] del día, sin recorrer los eventos"""
+    return conexion.execute('''
+        SELECT p.nivel, p.grado, p.grupo, p.presentes, COALESCE(o.total, 0)
+        FROM presencia_grupo_diaria p
+        LEFT JOIN grupo_ocupacion o
+            ON o.nivel = p.nivel AND o.grado = p.grado AND o.grupo = p.grupo
+        WHERE p.fecha = ?
+        ORDER BY p.nivel, p.grado, p.grupo
+    ''', (fecha,)).fetchall()
+
+def asistencia_del_dia(conexion, fecha, nivel="", grado="", grupo=""):
+    """[(matricula, nombre, primera_entrada, ultima_salida, segundos_en_plantel), ...]"""
+    condiciones = ["d.fecha = ?"]
+    parametros = [fecha]
+    for columna, valor in (("nivel", nivel), ("grado", grado), ("grupo", grupo)):
+        if valor:
+            condiciones.append(f"a.{columna} = ?")
+            parametros.append(valor)
+    return conexion.execute(f'''
+        SELECT a.matricula, a.nombre, d.primera_entrada, d.ultima_salida, d.segundos_en_plantel
+        FROM asistencia_diaria d
+        JOIN alumnos a ON a.id = d.alumno_id
+        WHERE {" AND ".join(condiciones)}
+        ORDER BY a.nombre
+    ''', parametros).fetchall()
+
+@functools.lru_cache(maxsize=None)
+def _sentencia_consulta(forma, columnas):
+    """Texto SQL de cada forma de consulta, construido una vez por combinación de filtros.
+
+    Un texto idéntico en cada llamada permite que sqlite3 reutilice la sentencia preparada.
+    """
+    filtro = " AND ".join(f"{columna} = ?" for columna in columnas) or "1"
+    filtro_a = " AND ".join(f"a.{columna} = ?" for columna in columnas) or "1"
+    if forma == 'total':
+        # Los contadores por grupo evitan un COUNT(*) sobre alumnos
+        return f"SELECT COALESCE(SUM(total), 0) FROM grupo_ocupacion WHERE {filtro}"
+    if forma == 'fts':
+        return f'''
+            SELECT a.id, a.matricula, a.nombre, a.edad, a.grupo, a.fecha_registro
+            FROM alumnos_fts
+            JOIN alumnos a ON a.id = alumnos_fts.rowid
+            WHERE alumnos_fts MATCH ? AND {filtro_a}
+            ORDER BY alumnos_fts.rank
+            LIMIT ?
+        '''
+    if forma == 'like':
+        return f'''
+            SELECT id, matricula, nombre, edad, grupo, fecha_registro
+            FROM alumnos
+            WHERE (nombre LIKE ? OR matricula LIKE ?) AND {filtro}
+            ORDER BY nombre, id
+            LIMIT ?
+        '''
+
+    consulta = f'''
+            SELECT id, matricula, nombre, edad, grupo, fecha_registro
+            FROM alumnos
+            WHERE {filtro}
+        '''
+    if forma == 'siguiente':
+        # Continuar después de la última clave conocida: no se recorren las filas previas
+        return consulta + " AND (nombre, id) > (?, ?) ORDER BY nombre, id LIMIT ?"
+    # Salto a una página lejana (por ejemplo al arrastrar la barra)
+    return consulta + " ORDER BY nombre, id LIMIT ? OFFSET ?"
+
+class ConsultaPaginada:
+    """Alumnos filtrados por nivel/grado/grupo, leídos por páginas con paginación por clave.
+
+    Con texto de búsqueda se usa el índice FTS5 y los resultados se ordenan por relevancia.
+    """
+
+    def __init__(self, conexion, nivel="", grado="", grupo="", texto="",
+                 tamano_pagina=TAMANO_PAGINA_CONSULTA):
+        self.conexion = conexion
+        self.tamano_pagina = tamano_pagina
+        self._paginas = OrderedDict()
+        self._resultados = None
+        self._total = None
+
+        columnas = []
+        self.parametros = []
+        for columna, valor in (("nivel", nivel), ("grado", grado), ("grupo", grupo)):
+            if valor:
+                columnas.append(columna)
+                self.parametros.append(valor)
+        self.columnas = tuple(columnas)
+
+        if expresion_busqueda(texto):
+            self._resultados = self._buscar(texto)
+
+    def _buscar(self, texto):
+        if tiene_indice_texto(self.conexion):
+            consulta = _sentencia_consulta('fts', self.columnas)
+            parametros = [expresion_busqueda(texto)] + self.parametros + [MAX_RESULTADOS_BUSQUEDA]
+        else:
+            consulta = _sentencia_consulta('like', self.columnas)
+            patron = f"%{texto.strip()}%"
+            parametros = [patron, patron] + self.parametros + [MAX_RESULTADOS_BUSQUEDA]
+        return self.conexion.execute(consulta, parametros).fetchall()
+
+    def total(self):
+        """Filas que se pueden recorrer.
+
+        Con texto de búsqueda es una cota inferior: solo se traen las MAX_RESULTADOS_BUSQUEDA
+        más relevantes (ver truncada()).
+        """
+        if self._resultados is not None:
+            return len(self._resultados)
+        if self._total is None:
+            self._total = self.conexion.execute(_sentencia_consulta('total', self.columnas),
+                                                self.parametros).fetchone()[0]
+        return self._total
+
+    def truncada(self):
+        """True si la búsqueda tenía más coincidencias de las que se trajeron"""
+        return self._resultados is not None and len(self._resultados) >= MAX_RESULTADOS_BUSQUEDA
+
+    def filas(self, inicio, cantidad):
+        """Filas [inicio, inicio + cantidad) sin el id; precarga la página siguiente"""
+        primera = inicio // self.tamano_pagina
+        ultima = (inicio + cantidad) // self.tamano_pagina
+        resultado = []
+        for numero in range(primera, ultima + 1):
+            resultado.extend(self.pagina(numero))
+        self.pagina(ultima + 1)
+
+        desplazamiento = inicio - primera * self.tamano_pagina
+        return [fila[1:] for fila in resultado[desplazamiento:desplazamiento + cantidad]]
+
+    def pagina(self, numero):
+        if self._resultados is not None:
+            inicio = numero * self.tamano_pagina
+            return self._resultados[inicio:inicio + self.tamano_pagina]
+
+        if numero in self._paginas:
+            self._paginas.move_to_end(numero)
+            return self._paginas[numero]
+
+        anterior = self._paginas.get(numero - 1)
+        if anterior:
+            consulta = _sentencia_consulta('siguiente', self.columnas)
+            parametros = self.parametros + [anterior[-1][2], anterior[-1][0], self.tamano_pagina]
+        else:
+            consulta = _sentencia_consulta('salto', self.columnas)
+            parametros = self.parametros + [self.tamano_pagina, numero * self.tamano_pagina]
+
+        filas = self.conexion.execute(consulta, parametros).fetchall()
+        self._paginas[numero] = filas
+        if len(self._paginas) > MAX_PAGINAS_EN_MEMORIA:
+            self._paginas.popitem(last=False)
+        return filas
+
+    def tamano_memoria(self):
+        """Bytes aproximados de las filas en memoria, estimados a partir de una fila de muestra"""
+        filas = (self._resultados,) if self._resultados is not None else tuple(self._paginas.values())
+        cantidad = sum(len(pagina) for pagina in filas)
+        muestra = next((pagina[0] for pagina in filas if pagina), None)
+        if muestra is None:
+            return sys.getsizeof(self)
+        por_fila = sys.getsizeof(muestra) + sum(sys.getsizeof(valor) for valor in muestra)
+        return sys.getsizeof(self) + cantidad * por_fila
+
+class CacheConsultas:
+    """Consultas recientes por filtros normalizados, con expulsión LRU y tope de memoria.
+
+    Solo la usa el hilo de consultas. Un alta en un grupo invalida únicamente las entradas
+    cuyos filtros lo incluyen.
+    """
+
+    def __init__(self, max_consultas=MAX_CONSULTAS_EN_CACHE, max_memoria=MEMORIA_CACHE_CONSULTAS):
+        self.max_consultas = max_consultas
+        self.max_memoria = max_memoria
+        self._consultas = OrderedDict()
+        self._tamanos = {}
+
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidadas = 0
+
+    @staticmethod
+    def clave(nivel, grado, grupo, texto):
+        return (nivel.strip(), grado.strip(), grupo.strip(), " ".join(texto.split()).casefold())
+
+    def obtener(self, clave):
+        consulta = self._consultas.get(clave)
+        if consulta is None:
+            self.fallos += 1
+            METRICAS.contar('consulta.cache_fallos')
+            return None
+        self._consultas.move_to_end(clave)
+        self.aciertos += 1
+        METRICAS.contar('consulta.cache_aciertos')
+        return consulta
+
+    def guardar(self, clave, consulta):
+        self._consultas[clave] = consulta
+        self._consultas.move_to_end(clave)
+        self._tamanos[clave] = consulta.tamano_memoria()
+        self._expulsar()
+
+    def actualizar(self, consulta):
+        """Vuelve a medir una consulta guardada que creció al desplazarse por ella"""
+        for clave, guardada in self._consultas.items():
+            if guardada is consulta:
+                self._tamanos[clave] = consulta.tamano_memoria()
+                self._expulsar()
+                return
+
+    def _expulsar(self):
+        # Siempre se conserva la más reciente aunque por sí sola supere el tope
+        while len(self._consultas) > 1 and (len(self._consultas) > self.max_consultas
+                                            or sum(self._tamanos.values()) > self.max_memoria):
+            antigua, _ = self._consultas.popitem(last=False)
+            del self._tamanos[antigua]
+
+    def invalidar(self, nivel=None, grado=None, grupo=None):
+        """Descarta las consultas que incluyen al grupo; sin argumentos, todas"""
+        if nivel is None:
+            descartadas = list(self._consultas)
+        else:
+            descartadas = [clave for clave in self._consultas
+                           if clave[0] in ("", nivel) and clave[1] in ("", grado) and clave[2] in ("", grupo)]
+        for clave in descartadas:
+            del self._consultas[clave]
+            del self._tamanos[clave]
+        self.invalidadas += len(descartadas)
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            'consultas': len(self._consultas),
+            'memoria': sum(self._tamanos.values()),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+            'invalidadas': self.invalidadas
+        }
+
+def abrir_consulta(conexion, nivel, grado, grupo, texto, cantidad, cache=None):
+    """Crea la consulta (o la toma de la caché), la cuenta y trae la primera ventana.
+
+    Devuelve (consulta, total, filas).
+    """
+    with METRICAS.medir('consulta.buscar_registros'):
+        clave = CacheConsultas.clave(nivel, grado, grupo, texto)
+        consulta = cache.obtener(clave) if cache is not None else None
+        if consulta is None:
+            consulta = ConsultaPaginada(conexion, nivel, grado, grupo, texto)
+        filas = consulta.filas(0, cantidad)
+        if cache is not None:
+            cache.guardar(clave, consulta)
+        return consulta, consulta.total(), filas
+
+def tiene_indice_texto(conexion):
+    fila = conexion.execute('''
+        SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alumnos_fts'
+    ''').fetchone()
+    return fila is not None
+
+class GestorConexiones:
+    """Aplica un perfil de SQLite y reparte conexiones: una de escritura y una de lectura por hilo"""
+
+    def __init__(self, ruta, perfil=PERFIL_SQLITE):
+        self.ruta = ruta
+        self.pragmas = PERFILES_SQLITE[perfil]
+        self._escritura = None
+        self._local = threading.local()
+        self._abiertas = []
+        self._lock = threading.Lock()
+
+    def escritura(self):
+        """Conexión principal de escritura; solo debe usarse desde el hilo que la creó"""
+        if self._escritura is None:
+            self._escritura = self.nueva_conexion()
+        return self._escritura
+
+    def nueva_conexion(self):
+        """Conexión de escritura adicional para un hilo en segundo plano"""
+        conexion = sqlite3.connect(self.ruta, cached_statements=SENTENCIAS_EN_CACHE)
+        self._configurar(conexion, escritura=True)
+        return self._registrar(conexion)
+
+    def lectura(self):
+        """Conexión de solo lectura propia del hilo actual; en WAL no bloquea a los escritores"""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = self.nueva_lectura()
+            self._local.conexion = conexion
+        return conexion
+
+    def nueva_lectura(self):
+        """Conexión de solo lectura para un hilo de corta vida; quien la abre la cierra con cerrar_conexion"""
+        conexion = sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True,
+                                   cached_statements=SENTENCIAS_EN_CACHE)
+        self._configurar(conexion, escritura=False)
+        return self._registrar(conexion)
+
+    def cerrar_conexion(self, conexion):
+        with self._lock:
+            if conexion in self._abiertas:
+                self._abiertas.remove(conexion)
+        conexion.close()
+
+    def cerrar(self):
+        with self._lock:
+            abiertas, self._abiertas = self._abiertas, []
+        for conexion in abiertas:
+            try:
+                conexion.close()
+            except sqlite3.ProgrammingError:
+                # Conexiones creadas en otro hilo; se cierran al terminar ese hilo
+                pass
+        self._escritura = None
+        self._local = threading.local()
+
+    def _configurar(self, conexion, escritura):
+        for nombre, valor in self.pragmas.items():
+            # El modo del diario es persistente en el archivo y solo lo cambia un escritor
+            if nombre == 'journal_mode' and not escritura:
+                continue
+            conexion.execute(f"PRAGMA {nombre} = {valor}")
+
+    def _registrar(self, conexion):
+        with self._lock:
+            self._abiertas.append(conexion)
+        return conexion
+
+class EjecutorConsultas:
+    """Ejecuta funciones funcion(conexion, *args) en un hilo con conexión propia.
+
+    Los resultados vuelven al hilo de Tk mediante after(): al_terminar(resultado) o
+    al_fallar(error). Al enviar una tarea con el mismo grupo que otra, la anterior se
+    cancela si no ha empezado o se interrumpe si está corriendo, y su resultado se descarta.
+    """
+
+    _FIN = object()
+
+    def __init__(self, bd, widget, solo_lectura=False, nombre="consultas"):
+        self.bd = bd
+        self.widget = widget
+        self.solo_lectura = solo_lectura
+        self.nombre = nombre
+        self._cola = queue.Queue()
+        self._terminadas = queue.Queue()
+        self._vigentes = {}
+        self._pendientes = 0
+        self._revision = None
+        self._hilo = None
+        self._conexion = None
+        self._actual = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        if self._hilo is None:
+            listo = threading.Event()
+            self._hilo = threading.Thread(target=self._bucle, args=(listo,), daemon=True)
+            self._hilo.start()
+            listo.wait()
+
+    def enviar(self, funcion, *args, al_terminar=None, al_fallar=None, grupo=None):
+        """Encola la tarea y devuelve su Future; debe llamarse desde el hilo de Tk"""
+        futuro = Future()
+        if grupo is not None:
+            self.cancelar(grupo)
+            self._vigentes[grupo] = futuro
+        self._cola.put((futuro, funcion, args, al_terminar, al_fallar, grupo))
+        self._pendientes += 1
+        if self._revision is None:
+            self._revision = self.widget.after(INTERVALO_RESULTADOS_MS, self._entregar)
+        return futuro
+
+    def cancelar(self, grupo):
+        """Descarta la tarea vigente del grupo, interrumpiendo la consulta si ya empezó"""
+        futuro = self._vigentes.pop(grupo, None)
+        if futuro is None or futuro.cancel():
+            return
+        with self._lock:
+            if self._actual is futuro:
+                self._conexion.interrupt()
+
+    def cerrar(self):
+        if self._hilo is not None:
+            self._cola.put(self._FIN)
+            self._hilo.join()
+            self._hilo = None
+        if self._revision is not None:
+            self.widget.after_cancel(self._revision)
+            self._revision = None
+
+    def _bucle(self, listo):
+        # La conexión se crea y se usa solo en este hilo
+        self._conexion = self.bd.lectura() if self.solo_lectura else self.bd.nueva_conexion()
+        listo.set()
+        while True:
+            tarea = self._cola.get()
+            if tarea is self._FIN:
+                break
+            futuro, funcion, args, al_terminar, al_fallar, grupo = tarea
+            if not futuro.set_running_or_notify_cancel():
+                self._terminadas.put(tarea)
+                continue
+
+            with self._lock:
+                self._actual = futuro
+            try:
+                try:
+                    resultado = funcion(self._conexion, *args)
+                except sqlite3.OperationalError as e:
+                    # Una interrupción dirigida a la tarea anterior puede alcanzar a esta: reintentar
+                    if str(e) != 'interrupted' or self._descartada(futuro, grupo):
+                        raise
+                    resultado = funcion(self._conexion, *args)
+            except BaseException as e:
+                with self._lock:
+                    self._actual = None
+                futuro.set_exception(e)
+            else:
+                with self._lock:
+                    self._actual = None
+                futuro.set_result(resultado)
+            self._terminadas.put(tarea)
+
+        if not self.solo_lectura:
+            self.bd.cerrar_conexion(self._conexion)
+
+    def _descartada(self, futuro, grupo):
+        return grupo is not None and self._vigentes.get(grupo) is not futuro
+
+    def _entregar(self):
+        # Hilo de Tk: llamar a los callbacks de las tareas terminadas
+        self._revision = None
+        while True:
+            try:
+                futuro, _, _, al_terminar, al_fallar, grupo = self._terminadas.get_nowait()
+            except queue.Empty:
+                break
+            self._pendientes -= 1
+            if futuro.cancelled() or self._descartada(futuro, grupo):
+                continue
+            if grupo is not None:
+                del self._vigentes[grupo]
+
+            error = futuro.exception()
+            if error is None:
+                if al_terminar is not None:
+                    al_terminar(futuro.result())
+            elif al_fallar is not None:
+                al_fallar(error)
+            else:
+                print(f"Error en {self.nombre}: {error}", file=sys.stderr)
+
+        if self._pendientes:
+            self._revision = self.widget.after(INTERVALO_RESULTADOS_MS, self._entregar)
+
+def insertar_alumno(conexion, datos):
+    """Valida cupo y matrícula e inserta al alumno en una sola transacción; devuelve su id"""
+    matricula, _, _, nivel, grado, grupo, *_ = datos
+    with METRICAS.medir('bd.guardar_alumno'), conexion:
+        if ocupacion_grupo(conexion, nivel, grado, grupo) >= LIMITE_GRUPO:
+            raise ValueError(f"El grupo ha alcanzado el límite máximo de {LIMITE_GRUPO} alumnos")
+        if conexion.execute('SELECT 1 FROM alumnos WHERE matricula = ?', (matricula,)).fetchone():
+            raise ValueError("La matrícula ya existe en el sistema")
+
+        # La foto va al almacén; la fila del alumno solo guarda su hash (o nada si no hay foto)
+        foto_hash = AlmacenFotos(conexion).guardar(datos[7]) if datos[7] else None
+        cursor = conexion.execute('''
+            INSERT INTO alumnos 
+            (matricula, nombre, edad, nivel, grado, grupo, codigo_barras, foto_hash, fecha_registro) 
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', datos[:7] + (foto_hash, datos[8]))
+    return cursor.lastrowid
 
 class SistemaRegistroEscolar:
     def __init__(self, root):
@@ -32,122 +1290,1346 @@ class SistemaRegistroEscolar:
         # Inicializar base de datos local
         self.inicializar_base_datos()
 
+        # Generador de credenciales QR compartido: la caché sirve a todas las páginas
+        self.credenciales = GeneradorCredenciales()
+
+        # Índice en memoria de credenciales para que el lector nunca toque el disco
+        self.indice_credenciales = IndiceCredenciales()
+        self.indice_credenciales.cargar(self.conexion)
+
+        # Escritor en segundo plano para los eventos de entrada/salida
+        self.escritor_registros = EscritorRegistros(self.bd)
+        self.escritor_registros.iniciar()
+
+        # Ninguna consulta de las páginas corre en el hilo de Tk: lecturas y escrituras van
+        # a hilos propios (las lecturas se pueden interrumpir al cambiar los filtros)
+        self.consultas = EjecutorConsultas(self.bd, root, solo_lectura=True)
+        self.consultas.iniciar()
+        # Solo el hilo de consultas la toca; las invalidaciones se le envían como tareas
+        self.cache_consultas = CacheConsultas()
+        self.escrituras = EjecutorConsultas(self.bd, root, nombre="escrituras")
+        self.escrituras.iniciar()
+
+        # Volcado periódico de las métricas de rendimiento a disco
+        self.volcador_metricas = VolcadorMetricas()
+        self.volcador_metricas.iniciar()
+        self.root.protocol("WM_DELETE_WINDOW", self.salir)
+
         # Variables de usuario
         self.usuario = tk.StringVar()
         self.contrasena = tk.StringVar()
 
-        # Crear frames para transiciones
+        # Los frames se crean la primera vez que se muestran
         self.frames = {}
-        for F in (PaginaLogin, PaginaNiveles, PaginaRegistro, PaginaLectorQR, PaginaConsulta):
-            frame = F(self.root, self)
-            self.frames[F] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
+        self.frame_actual = None
 
         self.mostrar_frame(PaginaLogin)
 
+    def obtener_frame(self, cont):
+        if cont not in self.frames:
+            frame = cont(self.root, self)
+            self.frames[cont] = frame
+            frame.grid(row=0, column=0, sticky="nsew")
+        return self.frames[cont]
+
     def mostrar_frame(self, cont):
-        frame = self.frames[cont]
+        anterior = self.frame_actual
+        frame = self.obtener_frame(cont)
+
+        # Las páginas con recursos (cámara) los sueltan al ocultarse y los retoman al mostrarse
+        if anterior is not None and anterior is not cont and hasattr(self.frames[anterior], 'al_ocultar'):
+            self.frames[anterior].al_ocultar()
+
         frame.tkraise()
+        self.frame_actual = cont
+        if anterior is not cont and hasattr(frame, 'al_mostrar'):
+            frame.al_mostrar()
 
     def cerrar_sesion(self):
         self.usuario.set("")
         self.contrasena.set("")
         self.mostrar_frame(PaginaLogin)
 
+    def salir(self):
+        # Garantizar que los eventos pendientes se escriban antes de cerrar
+        for frame in self.frames.values():
+            if hasattr(frame, 'al_ocultar'):
+                frame.al_ocultar()
+        self.consultas.cerrar()
+        self.escrituras.cerrar()
+        self.escritor_registros.cerrar()
+        self.volcador_metricas.cerrar()
+        self.bd.cerrar()
+        self.root.destroy()
+
     def inicializar_base_datos(self):
-        self.conexion = sqlite3.connect('registro_escolar.db')
-        cursor = self.conexion.cursor()
-    
-        # Primero, eliminar la base de datos existente si existe
-        cursor.execute("DROP TABLE IF EXISTS alumnos")
-        cursor.execute("DROP TABLE IF EXISTS registro_entrada_salida")
-    
-        # Crear tabla de alumnos con la columna fecha_registro
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alumnos (
-                id INTEGER PRIMARY KEY,
-                matricula TEXT UNIQUE,
-                nombre TEXT,
-                edad INTEGER,
-                nivel TEXT,
-                grado TEXT,
-                grupo TEXT,
-                codigo_barras TEXT UNIQUE,
-                fotografia BLOB,
-                fecha_registro DATETIME
-            )
-        ''')
-    
-        # Crear tabla de registro de entrada/salida
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS registro_entrada_salida (
-                id INTEGER PRIMARY KEY,
-                alumno_id INTEGER,
-                fecha_hora DATETIME,
-                tipo TEXT,
-                FOREIGN KEY (alumno_id) REFERENCES alumnos(id)
-            )
-        ''')
-    
-        self.conexion.commit()
-    
-        # Crear índices para mejorar el rendimiento
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_alumno_nivel 
-            ON alumnos(nivel)
-        ''')
-    
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_alumno_grupo 
-            ON alumnos(nivel, grado, grupo)
-        ''')
-    
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_registro_alumno 
-            ON registro_entrada_salida(alumno_id)
-        ''')
-    
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_registro_fecha 
-            ON registro_entrada_salida(fecha_hora)
-        ''')
-    
-        # Crear vista para contar alumnos por grupo
+        self.bd = GestorConexiones(RUTA_BASE_DATOS)
+        self.conexion = self.bd.escritura()
+        # Solo se ejecutan los pasos del esquema que falten; los datos existentes se conservan
+        self.tiempos_migracion = migrar_base_datos(self.conexion)
+
+    def guardar_alumno(self, datos, al_terminar=None, al_fallar=None):
+        """Guarda al alumno en el hilo de escritura; al_terminar(id) se llama en el hilo de Tk"""
+        def guardado(alumno_id):
+            self.indice_credenciales.agregar(alumno_id, datos)
+            self.invalidar_consultas(*datos[3:6])
+            if al_terminar is not None:
+                al_terminar(alumno_id)
+
+        return self.escrituras.enviar(insertar_alumno, datos, al_terminar=guardado, al_fallar=al_fallar)
+
+    def invalidar_consultas(self, *grupo):
+        """Descarta de la caché las consultas que incluyen (nivel, grado, grupo); sin argumentos, todas"""
+        # Pasa por la cola del hilo de consultas: queda ordenado después de las búsquedas en curso
+        self.consultas.enviar(lambda conexion: self.cache_consultas.invalidar(*grupo))
+
+class IndiceCredenciales:
+    """Índice compacto codigo_barras -> (id, nombre, nivel, grado, grupo) sin fotografías"""
+
+    def __init__(self):
+        self._alumnos = {}
+
+    def cargar(self, conexion):
+        cursor = conexion.cursor()
         cursor.execute('''
-            CREATE VIEW IF NOT EXISTS view_alumnos_por_grupo AS
-            SELECT nivel, grado, grupo, COUNT(*) as total_alumnos
+            SELECT codigo_barras, id, nombre, nivel, grado, grupo
             FROM alumnos
-            GROUP BY nivel, grado, grupo
         ''')
-    
-        # Crear trigger para verificar límite de alumnos por grupo
-        cursor.execute('''
-            CREATE TRIGGER IF NOT EXISTS check_grupo_limite
-            BEFORE INSERT ON alumnos
-            BEGIN
-                SELECT CASE
-                    WHEN (
-                        SELECT COUNT(*)
-                        FROM alumnos
-                    WHERE nivel = NEW.nivel
-                    AND grado = NEW.grado
-                    AND grupo = NEW.grupo
-                ) >= 45
-                THEN RAISE(ABORT, 'El grupo ha alcanzado el límite máximo de 45 alumnos')
-            END;
-        END;
-    ''')
-    
-        self.conexion.commit()
+        self._alumnos = {}
+        for codigo, alumno_id, nombre, nivel, grado, grupo in cursor:
+            self._guardar(codigo, alumno_id, nombre, nivel, grado, grupo)
 
-    def guardar_alumno(self, datos):
-        cursor = self.conexion.cursor()
-        cursor.execute('''
-            INSERT INTO alumnos 
-            (matricula, nombre, edad, nivel, grado, grupo, codigo_barras, fotografia, fecha_registro) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', datos)
-        self.conexion.commit()
+    def agregar(self, alumno_id, datos):
+        # datos sigue el orden de columnas de guardar_alumno
+        _, nombre, _, nivel, grado, grupo, codigo, *_ = datos
+        self._guardar(codigo, alumno_id, nombre, nivel, grado, grupo)
+
+    def _guardar(self, codigo, alumno_id, nombre, nivel, grado, grupo):
+        # Internar los valores repetidos para que todos los alumnos compartan las mismas cadenas
+        self._alumnos[codigo] = (alumno_id, nombre,
+                                 sys.intern(nivel), sys.intern(grado), sys.intern(grupo))
+
+    def buscar(self, codigo):
+        return self._alumnos.get(codigo)
+
+    def tamano_memoria(self):
+        """Bytes aproximados ocupados por el índice"""
+        total = sys.getsizeof(self._alumnos)
+        compartidas = set()
+        for codigo, alumno in self._alumnos.items():
+            total += sys.getsizeof(codigo) + sys.getsizeof(alumno)
+            total += sys.getsizeof(alumno[0]) + sys.getsizeof(alumno[1])
+            compartidas.update(alumno[2:])
+        return total + sum(sys.getsizeof(valor) for valor in compartidas)
+
+    def __len__(self):
+        return len(self._alumnos)
+
+class EscritorRegistros:
+    """Acumula eventos de entrada/salida y los guarda por lotes en un hilo propio"""
+
+    _FIN = object()
+
+    def __init__(self, bd, intervalo_ms=INTERVALO_ESCRITURA_MS, max_lote=MAX_EVENTOS_LOTE):
+        self.bd = bd
+        self.intervalo = intervalo_ms / 1000.0
+        self.max_lote = max_lote
+        self._cola = queue.Queue()
+        self._hilo = None
+
+        self.escritos = 0
+        self.lotes = 0
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, daemon=True)
+            self._hilo.start()
+
+    def registrar(self, alumno_id, tipo, fecha_hora=None):
+        """Encola un evento; nunca bloquea al hilo que llama"""
+        self._cola.put((alumno_id, fecha_hora or datetime.now(), tipo))
+
+    def pendientes(self):
+        return self._cola.qsize()
+
+    def cerrar(self):
+        # Volcar todo lo pendiente antes de terminar
+        if self._hilo is not None:
+            self._cola.put(self._FIN)
+            self._hilo.join()
+            self._hilo = None
+
+    def _bucle(self):
+        # sqlite3 no permite compartir conexiones entre hilos: el escritor abre la suya
+        conexion = self.bd.nueva_conexion()
+        # Incorporar lo que quedó fuera de los resúmenes si la sesión anterior se interrumpió
+        self._resumir(conexion)
+        pendientes = []
+        limite = 0.0
+
+        while True:
+            espera = max(0.0, limite - time.monotonic()) if pendientes else None
+            try:
+                evento = self._cola.get(timeout=espera)
+            except queue.Empty:
+                evento = None
+
+            if evento is self._FIN:
+                if pendientes:
+                    self._volcar(conexion, pendientes)
+                break
+
+            if evento is not None:
+                if not pendientes:
+                    limite = time.monotonic() + self.intervalo
+                pendientes.append(evento)
+
+            if pendientes and (len(pendientes) >= self.max_lote or time.monotonic() >= limite):
+                if self._volcar(conexion, pendientes):
+                    pendientes = []
+                else:
+                    # Reintentar en el siguiente intervalo sin perder eventos
+                    limite = time.monotonic() + self.intervalo
+
+        self.bd.cerrar_conexion(conexion)
+
+    def _volcar(self, conexion, eventos):
+        try:
+            with METRICAS.medir('bd.volcado_registros'), conexion:
+                conexion.executemany('''
+                    INSERT INTO registro_entrada_salida (alumno_id, fecha_hora, tipo)
+                    VALUES (?, ?, ?)
+                ''', eventos)
+        except sqlite3.Error as e:
+            print(f"Error al guardar registros: {e}", file=sys.stderr)
+            METRICAS.contar('bd.volcados_fallidos')
+            return False
+
+        self.escritos += len(eventos)
+        self.lotes += 1
+        METRICAS.contar('registros.escritos', len(eventos))
+        # Los eventos ya están a salvo; si el resumen falla se retoma desde la marca
+        self._resumir(conexion)
+        return True
+
+    def _resumir(self, conexion):
+        try:
+            actualizar_resumenes(conexion)
+        except sqlite3.Error as e:
+            print(f"Error al actualizar resúmenes de asistencia: {e}", file=sys.stderr)
+
+def _ingerir_foto_importacion(ruta):
+    # Se ejecuta en un proceso aparte: devolver solo tipos simples
+    try:
+        return procesar_foto(ruta).datos, None
+    except Exception as e:
+        return None, str(e)
+
+class ImportadorAlumnos:
+    """Importa alumnos desde CSV/XLSX por lotes, procesando las fotos en paralelo"""
+
+    def __init__(self, conexion, indice_credenciales=None, carpeta_fotos=None,
+                 tamano_lote=TAMANO_LOTE_IMPORTACION, procesos=None, progreso=None, cancelado=None):
+        self.conexion = conexion
+        self.indice_credenciales = indice_credenciales
+        self.carpeta_fotos = carpeta_fotos
+        self.tamano_lote = tamano_lote
+        self.procesos = procesos
+        self.progreso = progreso
+        self.cancelado = cancelado or threading.Event()
+
+        self.insertados = 0
+        self.errores = []
+
+    def importar(self, ruta):
+        """Devuelve (insertados, [(fila, mensaje), ...]); los errores no detienen la importación"""
+        self._cargar_estado()
+        procesadas = 0
+        with ProcessPoolExecutor(max_workers=self.procesos) as ejecutor:
+            for lote in self._lotes(self._leer_filas(ruta)):
+                if self.cancelado.is_set():
+                    break
+                self._importar_lote(lote, ejecutor)
+                procesadas += len(lote)
+                if self.progreso:
+                    self.progreso(procesadas, self.insertados, len(self.errores))
+        return self.insertados, self.errores
+
+    def _cargar_estado(self):
+        # Cupos y matrículas existentes en memoria: una consulta en vez de una por fila
+        self.ocupacion = {
+            (nivel, grado, grupo): total
+            for nivel, grado, grupo, total in self.conexion.execute(
+                'SELECT nivel, grado, grupo, total FROM grupo_ocupacion')
+        }
+        self.matriculas = {fila[0] for fila in self.conexion.execute('SELECT matricula FROM alumnos')}
+
+    def _leer_filas(self, ruta):
+        if ruta.lower().endswith(('.xlsx', '.xlsm')):
+            try:
+                import openpyxl
+            except ImportError:
+                raise ValueError("Se requiere el paquete openpyxl para importar archivos de Excel")
+            libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+            filas = libro.active.iter_rows(values_only=True)
+            encabezados = [str(c).strip().lower() if c is not None else "" for c in next(filas, ())]
+            for numero, valores in enumerate(filas, start=2):
+                yield numero, dict(zip(encabezados, valores))
+            libro.close()
+        else:
+            with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+                lector = csv.DictReader(archivo)
+                lector.fieldnames = [c.strip().lower() for c in lector.fieldnames or []]
+                for numero, fila in enumerate(lector, start=2):
+                    yield numero, fila
+
+    def _lotes(self, filas):
+        lote = []
+        for fila in filas:
+            lote.append(fila)
+            if len(lote) >= self.tamano_lote:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+
+    def _validar(self, fila):
+        valores = {c: str(fila.get(c) or "").strip() for c in COLUMNAS_IMPORTACION}
+        if not all(valores[c] for c in COLUMNAS_IMPORTACION if c != "foto"):
+            raise ValueError("Faltan campos obligatorios")
+        try:
+            edad = float(valores["edad"])
+        except ValueError:
+            raise ValueError(f"Edad inválida: {valores['edad']}")
+        # "12.0" de una hoja de cálculo es válido; inf, nan, fracciones o negativos no
+        if not edad.is_integer() or edad < 0:
+            raise ValueError(f"Edad inválida: {valores['edad']}")
+        edad = int(edad)
+
+        nivel, grado, grupo = valores["nivel"], valores["grado"], valores["grupo"].upper()
+        if grado not in GRADOS.get(nivel, []) or grupo not in GRUPOS:
+            raise ValueError(f"Nivel, grado o grupo inválido: {nivel} {grado} {grupo}")
+        if valores["matricula"] in self.matriculas:
+            raise ValueError(f"La matrícula {valores['matricula']} ya existe")
+
+        clave = (nivel, grado, grupo)
+        if self.ocupacion.get(clave, 0) >= LIMITE_GRUPO:
+            raise ValueError(f"El grupo {nivel} {grado} {grupo} ha alcanzado el límite de {LIMITE_GRUPO} alumnos")
+
+        foto = None
+        if valores["foto"]:
+            foto = os.path.join(self.carpeta_fotos or "", valores["foto"])
+            if not os.path.isfile(foto):
+                raise ValueError(f"No se encontró la foto {foto}")
+
+        # Reservar el lugar y la matrícula antes de procesar el resto del lote
+        self.ocupacion[clave] = self.ocupacion.get(clave, 0) + 1
+        self.matriculas.add(valores["matricula"])
+        return (valores["matricula"], valores["nombre"], edad, nivel, grado, grupo,
+                f"{nivel}_{grado}_{valores['matricula']}", foto)
+
+    def _liberar(self, datos):
+        clave = datos[3:6]
+        self.ocupacion[clave] -= 1
+        self.matriculas.discard(datos[0])
+
+    def _importar_lote(self, lote, ejecutor):
+        validas = []
+        for numero, fila in lote:
+            try:
+                validas.append((numero, self._validar(fila)))
+            except ValueError as e:
+                self.errores.append((numero, str(e)))
+
+        # Procesar todas las fotos del lote en paralelo
+        rutas = [datos[7] for _, datos in validas if datos[7]]
+        procesadas = dict(zip(rutas, ejecutor.map(_ingerir_foto_importacion, rutas)))
+
+        almacen = AlmacenFotos(self.conexion)
+        insertados = []
+        self.conexion.execute("BEGIN")
+        try:
+            for numero, datos in validas:
+                foto, error = procesadas.get(datos[7], (None, None))
+                if error:
+                    self._liberar(datos)
+                    self.errores.append((numero, f"Foto inválida: {error}"))
+                    continue
+
+                # Un punto de guardado por fila: un error no descarta el resto del lote
+                self.conexion.execute("SAVEPOINT fila")
+                try:
+                    foto_hash = almacen.guardar(foto) if foto else None
+                    cursor = self.conexion.execute('''
+                        INSERT INTO alumnos
+                        (matricula, nombre, edad, nivel, grado, grupo, codigo_barras, foto_hash, fecha_registro)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', datos[:7] + (foto_hash, datetime.now()))
+                    self.conexion.execute("RELEASE fila")
+                    insertados.append((cursor.lastrowid, datos))
+                except sqlite3.Error as e:
+                    self.conexion.execute("ROLLBACK TO fila")
+                    self.conexion.execute("RELEASE fila")
+                    self._liberar(datos)
+                    self.errores.append((numero, str(e)))
+            self.conexion.commit()
+        except BaseException:
+            self.conexion.rollback()
+            raise
+
+        self.insertados += len(insertados)
+        if self.indice_credenciales is not None:
+            for alumno_id, datos in insertados:
+                self.indice_credenciales.agregar(alumno_id, datos)
+
+def _renderizar_qr(codigo):
+    # Se ejecuta en un proceso aparte: devolver PNG en bytes
+    import qrcode
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(codigo)
+    qr.make(fit=True)
+    salida = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(salida, format='PNG')
+    return salida.getvalue()
+
+def alumnos_para_credenciales(conexion, nivel, grado="", grupo=""):
+    """Itera (nombre, codigo_barras, grado, grupo) sin cargar todo el grupo en memoria"""
+    condiciones = ["nivel = ?"]
+    parametros = [nivel]
+    if grado:
+        condiciones.append("grado = ?")
+        parametros.append(grado)
+    if grupo:
+        condiciones.append("grupo = ?")
+        parametros.append(grupo)
+    yield from conexion.execute(f'''
+        SELECT nombre, codigo_barras, grado, grupo FROM alumnos
+        WHERE {" AND ".join(condiciones)}
+        ORDER BY grado, grupo, nombre, id
+    ''', parametros)
+
+class GeneradorCredenciales:
+    """Genera credenciales QR con caché por codigo_barras y las exporta en hojas imprimibles"""
+
+    def __init__(self, procesos=None):
+        self.procesos = procesos
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def png_qr(self, codigo):
+        with self._lock:
+            png = self._cache.get(codigo)
+            if png is not None:
+                self._cache.move_to_end(codigo)
+                return png
+        png = _renderizar_qr(codigo)
+        self._guardar(codigo, png)
+        return png
+
+    def imagen_qr(self, codigo):
+        return Image.open(io.BytesIO(self.png_qr(codigo)))
+
+    def _guardar(self, codigo, png):
+        with self._lock:
+            self._cache[codigo] = png
+            self._cache.move_to_end(codigo)
+            while len(self._cache) > MAX_QR_EN_CACHE:
+                self._cache.popitem(last=False)
+
+    def _precalcular(self, codigos, ejecutor):
+        with self._lock:
+            faltantes = [c for c in codigos if c not in self._cache]
+        for codigo, png in zip(faltantes, ejecutor.map(_renderizar_qr, faltantes)):
+            self._guardar(codigo, png)
+
+    def exportar(self, alumnos, ruta, progreso=None):
+        """Escribe las credenciales hoja por hoja en un PDF o en PNG numerados; devuelve las hojas"""
+        columnas, filas = CREDENCIALES_POR_HOJA
+        por_hoja = columnas * filas
+        es_pdf = ruta.lower().endswith('.pdf')
+        base, extension = os.path.splitext(ruta)
+
+        hojas = 0
+        total = 0
+        lote = []
+        with ProcessPoolExecutor(max_workers=self.procesos) as ejecutor:
+            for alumno in itertools.chain(alumnos, [None]):
+                if alumno is not None:
+                    lote.append(alumno)
+                    if len(lote) < por_hoja:
+                        continue
+                if not lote:
+                    break
+
+                # Solo una hoja vive en memoria a la vez
+                self._precalcular([codigo for _, codigo, *_ in lote], ejecutor)
+                hoja = self._componer_hoja(lote)
+                if es_pdf:
+                    hoja.save(ruta, format='PDF', resolution=150.0, append=hojas > 0)
+                else:
+                    hoja.save(f"{base}_{hojas + 1:03d}{extension or '.png'}", format='PNG')
+                hojas += 1
+                total += len(lote)
+                lote = []
+                if progreso:
+                    progreso(hojas, total)
+        return hojas
+
+    def _componer_hoja(self, alumnos):
+        columnas, filas = CREDENCIALES_POR_HOJA
+        ancho_celda = TAMANO_HOJA[0] // columnas
+        alto_celda = TAMANO_HOJA[1] // filas
+        hoja = Image.new('RGB', TAMANO_HOJA, 'white')
+        dibujo = ImageDraw.Draw(hoja)
+        fuente = _fuente_credencial(22)
+        fuente_chica = _fuente_credencial(16)
+
+        for posicion, (nombre, codigo, grado, grupo) in enumerate(alumnos):
+            x = (posicion % columnas) * ancho_celda
+            y = (posicion // columnas) * alto_celda
+            dibujo.rectangle([x + 10, y + 10, x + ancho_celda - 10, y + alto_celda - 10], outline='#6B4E71')
+
+            qr = self.imagen_qr(codigo).convert('RGB').resize((LADO_QR_HOJA, LADO_QR_HOJA), Image.NEAREST)
+            hoja.paste(qr, (x + (ancho_celda - LADO_QR_HOJA) // 2, y + 20))
+
+            texto_y = y + 30 + LADO_QR_HOJA
+            dibujo.text((x + ancho_celda // 2, texto_y), nombre, fill='black', font=fuente, anchor='ma')
+            dibujo.text((x + ancho_celda // 2, texto_y + 30), f"{grado} {grupo}",
+                        fill='#6B4E71', font=fuente_chica, anchor='ma')
+        return hoja
+
+def _fuente_credencial(tamano):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", tamano)
+    except OSError:
+        return ImageFont.load_default()
+
+# Conjuntos exportables: tablas de origen, columna de fecha para filtrar, orden y columnas
+# (nombre, expresión, tipo). Los filtros por nivel/grado/grupo usan el alias 'a' de alumnos.
+CONJUNTOS_EXPORTACION = {
+    'alumnos': ('alumnos a', None, 'a.id', (
+        ('id', 'a.id', 'entero'),
+        ('matricula', 'a.matricula', 'texto'),
+        ('nombre', 'a.nombre', 'texto'),
+        ('edad', 'a.edad', 'entero'),
+        ('nivel', 'a.nivel', 'texto'),
+        ('grado', 'a.grado', 'texto'),
+        ('grupo', 'a.grupo', 'texto'),
+        ('codigo_barras', 'a.codigo_barras', 'texto'),
+        ('foto_hash', 'a.foto_hash', 'texto'),
+        ('fecha_registro', 'a.fecha_registro', 'texto'))),
+    'registros': ('registro_entrada_salida r LEFT JOIN alumnos a ON a.id = r.alumno_id',
+                  'r.fecha_hora', 'r.fecha_hora, r.id', (
+        ('id', 'r.id', 'entero'),
+        ('alumno_id', 'r.alumno_id', 'entero'),
+        ('matricula', 'a.matricula', 'texto'),
+        ('fecha_hora', 'r.fecha_hora', 'texto'),
+        ('tipo', 'r.tipo', 'texto'))),
+    'asistencia': ('asistencia_diaria d JOIN alumnos a ON a.id = d.alumno_id',
+                   'd.fecha', 'd.fecha, d.alumno_id', (
+        ('fecha', 'd.fecha', 'texto'),
+        ('alumno_id', 'd.alumno_id', 'entero'),
+        ('matricula', 'a.matricula', 'texto'),
+        ('nivel', 'a.nivel', 'texto'),
+        ('grado', 'a.grado', 'texto'),
+        ('grupo', 'a.grupo', 'texto'),
+        ('primera_entrada', 'd.primera_entrada', 'texto'),
+        ('ultima_salida', 'd.ultima_salida', 'texto'),
+        ('segundos_en_plantel', 'd.segundos_en_plantel', 'entero'))),
+}
+
+class _SalidaCSV:
+    def __init__(self, ruta, columnas):
+        self._archivo = open(ruta, 'w', newline='', encoding='utf-8')
+        self._escritor = csv.writer(self._archivo)
+        self._escritor.writerow(columnas)
+
+    def escribir(self, filas):
+        self._escritor.writerows(filas)
+
+    def cerrar(self):
+        self._archivo.close()
+
+class _SalidaJSONL:
+    def __init__(self, ruta, columnas):
+        self._archivo = open(ruta, 'w', encoding='utf-8')
+        self._columnas = columnas
+
+    def escribir(self, filas):
+        self._archivo.writelines(
+            json.dumps(dict(zip(self._columnas, fila)), ensure_ascii=False) + "\n" for fila in filas)
+
+    def cerrar(self):
+        self._archivo.close()
+
+class _SalidaParquet:
+    """Un row group por bloque: pyarrow nunca ve más de un bloque a la vez"""
+
+    def __init__(self, ruta, columnas, tipos):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Se requiere el paquete pyarrow para exportar a Parquet")
+        self._pa = pa
+        self._esquema = pa.schema([(columna, pa.int64() if tipo == 'entero' else pa.string())
+                                   for columna, tipo in zip(columnas, tipos)])
+        self._escritor = pq.ParquetWriter(ruta, self._esquema)
+
+    def escribir(self, filas):
+        columnas = [list(valores) for valores in zip(*filas)]
+        self._escritor.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(valores, type=campo.type) for valores, campo in zip(columnas, self._esquema)],
+            schema=self._esquema))
+
+    def cerrar(self):
+        self._escritor.close()
+
+def _extension_foto(datos):
+    if datos[:2] == b'\xff\xd8':
+        return '.jpg'
+    if datos[:4] == b'RIFF' and datos[8:12] == b'WEBP':
+        return '.webp'
+    if datos[:8] == b'\x89PNG\r\n\x1a\n':
+        return '.png'
+    return '.bin'
+
+class ExportadorDatos:
+    """Exporta alumnos, eventos o asistencia diaria a CSV, JSONL o Parquet leyendo por bloques.
+
+    Las fotografías nunca van dentro del archivo: se referencian por foto_hash, se omiten
+    o se copian una vez por hash a carpeta_fotos.
+    """
+
+    def __init__(self, conexion, conjunto='alumnos', nivel="", grado="", grupo="", desde="", hasta="",
+                 fotos='referencia', carpeta_fotos=None, tamano_bloque=TAMANO_BLOQUE_EXPORTACION,
+                 progreso=None, cancelado=None):
+        if conjunto not in CONJUNTOS_EXPORTACION:
+            raise ValueError(f"Conjunto desconocido: {conjunto}")
+        self.conexion = conexion
+        self.conjunto = conjunto
+        self.filtros = (nivel, grado, grupo, desde, hasta)
+        self.fotos = fotos
+        self.carpeta_fotos = carpeta_fotos
+        self.tamano_bloque = tamano_bloque
+        self.progreso = progreso
+        self.cancelado = cancelado or threading.Event()
+
+        self.exportadas = 0
+
+    def exportar(self, ruta, formato=None):
+        """Devuelve las filas escritas, o None si se canceló (sin dejar archivo a medias)"""
+        formato = (formato or os.path.splitext(ruta)[1].lstrip('.')).lower()
+        if formato not in FORMATOS_EXPORTACION:
+            raise ValueError(f"Formato no soportado: {formato}")
+
+        consulta, parametros, columnas, tipos = self._consulta()
+        total = self.conexion.execute(f"SELECT COUNT(*) FROM ({consulta})", parametros).fetchone()[0]
+        if self.carpeta_fotos:
+            os.makedirs(self.carpeta_fotos, exist_ok=True)
+
+        temporal = ruta + '.tmp'
+        try:
+            if formato == 'csv':
+                salida = _SalidaCSV(temporal, columnas)
+            elif formato == 'jsonl':
+                salida = _SalidaJSONL(temporal, columnas)
+            else:
+                salida = _SalidaParquet(temporal, columnas, tipos)
+
+            try:
+                self._escribir(salida, consulta, parametros, columnas, total)
+            finally:
+                salida.cerrar()
+
+            if self.cancelado.is_set():
+                os.remove(temporal)
+                return None
+            os.replace(temporal, ruta)
+        except BaseException:
+            # Disco lleno, error de pyarrow, Ctrl+C...: no dejar el archivo temporal
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        return self.exportadas
+
+    def _escribir(self, salida, consulta, parametros, columnas, total):
+        cursor = self.conexion.execute(consulta, parametros)
+        try:
+            while not self.cancelado.is_set():
+                filas = cursor.fetchmany(self.tamano_bloque)
+                if not filas:
+                    break
+                if self.carpeta_fotos and 'foto_hash' in columnas:
+                    self._copiar_fotos(fila[columnas.index('foto_hash')] for fila in filas)
+                salida.escribir(filas)
+                self.exportadas += len(filas)
+                if self.progreso:
+                    self.progreso(self.exportadas, total)
+        finally:
+            cursor.close()
+
+    def _consulta(self):
+        origen, columna_fecha, orden, columnas = CONJUNTOS_EXPORTACION[self.conjunto]
+        if self.fotos == 'omitir':
+            columnas = tuple(columna for columna in columnas if columna[0] != 'foto_hash')
+
+        nivel, grado, grupo, desde, hasta = self.filtros
+        condiciones = []
+        parametros = []
+        for columna, valor in (("a.nivel", nivel), ("a.grado", grado), ("a.grupo", grupo)):
+            if valor:
+                condiciones.append(f"{columna} = ?")
+                parametros.append(valor)
+        if columna_fecha is not None:
+            # Rango sobre la columna sin funciones para que SQLite use su índice; el día final
+            # se incluye completo comparando contra el inicio del día siguiente
+            if desde:
+                condiciones.append(f"{columna_fecha} >= ?")
+                parametros.append(desde)
+            if hasta:
+                condiciones.append(f"{columna_fecha} < ?")
+                parametros.append((datetime.fromisoformat(hasta) + timedelta(days=1)).date().isoformat())
+
+        consulta = f"SELECT {', '.join(expresion for _, expresion, _ in columnas)} FROM {origen}"
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+        consulta += f" ORDER BY {orden}"
+        return consulta, parametros, [nombre for nombre, _, _ in columnas], [tipo for _, _, tipo in columnas]
+
+    def _copiar_fotos(self, hashes):
+        almacen = AlmacenFotos(self.conexion)
+        for foto_hash in hashes:
+            if foto_hash is None or any(
+                    os.path.exists(os.path.join(self.carpeta_fotos, foto_hash + extension))
+                    for extension in ('.jpg', '.webp', '.png', '.bin')):
+                continue
+            datos = almacen.original(foto_hash)
+            if datos is None:
+                continue
+            with open(os.path.join(self.carpeta_fotos, foto_hash + _extension_foto(datos)), 'wb') as archivo:
+                archivo.write(datos)
+
+class FiltroDuplicados:
+    """Caché LRU con caducidad que deja pasar un mismo código una vez por ventana de espera"""
+
+    def __init__(self, espera=ESPERA_ENTRE_LECTURAS, capacidad=MAX_CODIGOS_RECIENTES):
+        self.espera = espera
+        self.capacidad = capacidad
+        self._vistos = OrderedDict()
+        self.aceptados = 0
+        self.descartados = 0
+
+    def permitir(self, datos, ahora=None):
+        if ahora is None:
+            ahora = time.monotonic()
+
+        ultimo = self._vistos.get(datos)
+        if ultimo is not None and ahora - ultimo < self.espera:
+            self.descartados += 1
+            return False
+
+        self._vistos[datos] = ahora
+        self._vistos.move_to_end(datos)
+        self._purgar(ahora)
+        self.aceptados += 1
+        return True
+
+    def _purgar(self, ahora):
+        # Las entradas están ordenadas por hora de aceptación: las caducadas quedan al frente
+        while self._vistos:
+            datos, ultimo = next(iter(self._vistos.items()))
+            if ahora - ultimo < self.espera and len(self._vistos) <= self.capacidad:
+                break
+            self._vistos.popitem(last=False)
+
+    def __len__(self):
+        return len(self._vistos)
+
+def registrar_lectura(datos, filtro, indice, escritor):
+    """Guarda la entrada de cada código que pasa el antirrebote; devuelve el alumno o None.
+
+    El evento se registra siempre, haya o no lugar en el tablero de la interfaz.
+    """
+    # Las lecturas repetidas dentro de la ventana de espera no llegan a la base de datos
+    if not filtro.permitir(datos):
+        METRICAS.contar('lector.duplicados')
+        return None
+
+    alumno = indice.buscar(datos)
+    if alumno is None:
+        METRICAS.contar('lector.desconocidos')
+        return None
+
+    METRICAS.contar('lector.lecturas')
+    escritor.registrar(alumno[0], 'entrada')
+    return alumno
+
+# Código encontrado en una imagen; rect = (x, y, ancho, alto) en píxeles de esa imagen
+Deteccion = namedtuple('Deteccion', 'datos rect')
+
+class DecodificadorPyzbar:
+    """Decodifica QR y códigos de barras con zbar"""
+
+    nombre = 'pyzbar'
+
+    def __init__(self):
+        from pyzbar.pyzbar import decode
+        self._decode = decode
+
+    def detectar(self, imagen):
+        return [Deteccion(codigo.data.decode('utf-8'),
+                          (codigo.rect.left, codigo.rect.top, codigo.rect.width, codigo.rect.height))
+                for codigo in self._decode(imagen)]
+
+class DecodificadorOpenCV:
+    """Decodifica solo códigos QR con cv2.QRCodeDetector, sin dependencias nativas extra"""
+
+    nombre = 'opencv'
+
+    def __init__(self):
+        import cv2
+        self._cv2 = cv2
+        self._detector = cv2.QRCodeDetector()
+
+    def detectar(self, imagen):
+        try:
+            ok, textos, puntos, _ = self._detector.detectAndDecodeMulti(imagen)
+        except self._cv2.error:
+            return []
+        if not ok:
+            return []
+        return [Deteccion(texto, self._cv2.boundingRect(esquinas.astype('int32')))
+                for texto, esquinas in zip(textos, puntos) if texto]
+
+DECODIFICADORES = {
+    'pyzbar': DecodificadorPyzbar,
+    'opencv': DecodificadorOpenCV
+}
+
+def crear_decodificador(nombre=None):
+    """Motor de decodificación independiente de la interfaz: recibe arreglos de numpy"""
+    # DECODIFICADOR se lee al crear el motor, no al definir la función
+    return DECODIFICADORES[nombre or DECODIFICADOR]()
+
+class PlanificadorEscaneo:
+    """Decide si un frame se omite, se decodifica por regiones o se escanea completo"""
+
+    def __init__(self, decodificador=None, intervalo_completo=INTERVALO_ESCANEO_COMPLETO):
+        self.decodificador = decodificador
+        self.intervalo_completo = intervalo_completo
+        self._anterior = None
+        self._ultima_region = None
+        self._ultimo_completo = 0.0
+
+        # Contadores expuestos para diagnóstico
+        self.omitidos = 0
+        self.decodificados = 0
+        self.completos = 0
+
+    def estadisticas(self):
+        return {
+            'omitidos': self.omitidos,
+            'decodificados': self.decodificados,
+            'completos': self.completos
+        }
+
+    def decodificar(self, frame):
+        alto, ancho = frame.shape[:2]
+        region_movimiento = self._detectar_movimiento(frame)
+
+        # Escaneo completo a baja frecuencia por si la detección de movimiento falla
+        ahora = time.monotonic()
+        if ahora - self._ultimo_completo >= self.intervalo_completo:
+            self._ultimo_completo = ahora
+            self.completos += 1
+            return self._escanear(frame, (0, 0, ancho, alto))
+
+        # Frame estático: no hay nada nuevo que decodificar
+        if region_movimiento is None:
+            self.omitidos += 1
+            return []
+
+        region = region_movimiento
+        if self._ultima_region is not None:
+            region = self._unir(region, self._ultima_region)
+        return self._escanear(frame, self._expandir(region, ancho, alto))
+
+    def _detectar_movimiento(self, frame):
+        import cv2
+        alto, ancho = frame.shape[:2]
+        reducido = cv2.resize(frame, (ancho // ESCALA_MOVIMIENTO, alto // ESCALA_MOVIMIENTO),
+                              interpolation=cv2.INTER_AREA)
+        gris = cv2.cvtColor(reducido, cv2.COLOR_BGR2GRAY)
+        anterior, self._anterior = self._anterior, gris
+        if anterior is None:
+            return (0, 0, ancho, alto)
+
+        diferencia = cv2.absdiff(gris, anterior)
+        _, mascara = cv2.threshold(diferencia, UMBRAL_DIFERENCIA, 255, cv2.THRESH_BINARY)
+        if cv2.countNonZero(mascara) < UMBRAL_MOVIMIENTO * mascara.size:
+            return None
+
+        x, y, w, h = cv2.boundingRect(cv2.findNonZero(mascara))
+        return (x * ESCALA_MOVIMIENTO, y * ESCALA_MOVIMIENTO,
+                w * ESCALA_MOVIMIENTO, h * ESCALA_MOVIMIENTO)
+
+    def _escanear(self, frame, region):
+        # El decodificador se crea en el hilo que lo usa, la primera vez que hace falta
+        if self.decodificador is None:
+            self.decodificador = crear_decodificador()
+        x, y, w, h = region
+        self.decodificados += 1
+        datos = []
+        for deteccion in self.decodificador.detectar(frame[y:y + h, x:x + w]):
+            rx, ry, rw, rh = deteccion.rect
+            # Guardar la región en coordenadas del frame completo
+            self._ultima_region = (x + rx, y + ry, rw, rh)
+            datos.append(deteccion.datos)
+        if not datos:
+            self._ultima_region = None
+        return datos
+
+    @staticmethod
+    def _unir(a, b):
+        x0 = min(a[0], b[0])
+        y0 = min(a[1], b[1])
+        x1 = max(a[0] + a[2], b[0] + b[2])
+        y1 = max(a[1] + a[3], b[1] + b[3])
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    @staticmethod
+    def _expandir(region, ancho, alto):
+        x, y, w, h = region
+        x0 = max(0, x - MARGEN_REGION)
+        y0 = max(0, y - MARGEN_REGION)
+        x1 = min(ancho, x + w + MARGEN_REGION)
+        y1 = min(alto, y + h + MARGEN_REGION)
+        return (x0, y0, x1 - x0, y1 - y0)
+
+class FuenteSimulada:
+    """Fuente de video sin hardware con la interfaz de cv2.VideoCapture, para pruebas"""
+
+    def __init__(self, frames, fps=FPS_CAMARA, desconectar_tras=None):
+        self.frames = list(frames)
+        self.intervalo = 1.0 / fps
+        # Simula que el dispositivo se desconecta tras entregar ese número de frames
+        self.desconectar_tras = desconectar_tras
+        self.entregados = 0
+        self._abierta = True
+        self._ultimo = 0.0
+
+    def isOpened(self):
+        return self._abierta
+
+    def set(self, propiedad, valor):
+        return False
+
+    def get(self, propiedad):
+        return 0
+
+    def read(self):
+        if not self._abierta or (self.desconectar_tras is not None
+                                 and self.entregados >= self.desconectar_tras):
+            return False, None
+
+        espera = self._ultimo + self.intervalo - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        self._ultimo = time.monotonic()
+
+        frame = self.frames[self.entregados % len(self.frames)]
+        self.entregados += 1
+        return True, frame.copy()
+
+    def release(self):
+        self._abierta = False
+
+class ServicioCamara:
+    """Abre la cámara bajo demanda, negocia el formato en el dispositivo y se reconecta si se pierde"""
+
+    def __init__(self, fuente=FUENTE_CAMARA, tamano=TAMANO_VIDEO, fps=FPS_CAMARA, mjpeg=USAR_MJPEG):
+        self.fuente = fuente
+        self.tamano = tamano
+        self.fps = fps
+        self.mjpeg = mjpeg
+        self.captura = None
+        self.estado = 'cerrada'
+        self.reconexiones = 0
+
+        self._fallos = 0
+        self._espera = 0.5
+        self._proximo_intento = 0.0
+
+    def abrir(self):
+        if self.captura is not None:
+            return True
+        if time.monotonic() < self._proximo_intento:
+            return False
+
+        captura = self._crear_captura()
+        if not captura.isOpened():
+            captura.release()
+            self._programar_reintento()
+            return False
+
+        self.captura = captura
+        self.estado = 'abierta'
+        self._fallos = 0
+        self._espera = 0.5
+        return True
+
+    def _crear_captura(self):
+        # Una fábrica de fuentes (por ejemplo lambda: FuenteSimulada(frames)) sustituye al dispositivo
+        if callable(self.fuente):
+            return self.fuente()
+
+        import cv2
+        captura = cv2.VideoCapture(self.fuente)
+        ancho, alto = self.tamano
+        # Pedir el formato al dispositivo en lugar de redimensionar cada frame
+        if self.mjpeg:
+            captura.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        captura.set(cv2.CAP_PROP_FRAME_WIDTH, ancho)
+        captura.set(cv2.CAP_PROP_FRAME_HEIGHT, alto)
+        captura.set(cv2.CAP_PROP_FPS, self.fps)
+        captura.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return captura
+
+    def leer(self):
+        """Devuelve el siguiente frame o None si la cámara no está disponible"""
+        if self.captura is None and not self.abrir():
+            return None
+
+        ret, frame = self.captura.read()
+        if not ret:
+            self._fallos += 1
+            if self._fallos >= MAX_FALLOS_LECTURA:
+                # Dispositivo desconectado: soltarlo y reintentar más tarde
+                self._liberar()
+                self.reconexiones += 1
+                self._programar_reintento()
+            return None
+
+        self._fallos = 0
+        # Solo si el dispositivo no aceptó la resolución pedida
+        if frame.shape[1::-1] != tuple(self.tamano):
+            import cv2
+            frame = cv2.resize(frame, self.tamano)
+        return frame
+
+    def _programar_reintento(self):
+        self.estado = 'reconectando'
+        self._proximo_intento = time.monotonic() + self._espera
+        self._espera = min(self._espera * 2, ESPERA_MAXIMA_RECONEXION)
+
+    def _liberar(self):
+        if self.captura is not None:
+            self.captura.release()
+            self.captura = None
+
+    def cerrar(self):
+        self._liberar()
+        self.estado = 'cerrada'
+        self._proximo_intento = 0.0
+        self._espera = 0.5
+
+# Lectura de un código: marca de tiempo de captura, cámara de origen y contenido
+EventoEscaneo = namedtuple('EventoEscaneo', 'marca camara datos')
+
+# Decodificadores por proceso del pool (se crean una vez en cada proceso)
+_decodificadores_proceso = {}
+
+def _detectar_en_proceso(nombre, imagen):
+    if nombre not in _decodificadores_proceso:
+        _decodificadores_proceso[nombre] = crear_decodificador(nombre)
+    return [tuple(d) for d in _decodificadores_proceso[nombre].detectar(imagen)]
+
+class DecodificadorRemoto:
+    """Decodifica en un proceso del pool; solo bloquea al hilo de la cámara que lo usa"""
+
+    def __init__(self, ejecutor, nombre=None):
+        self.ejecutor = ejecutor
+        self.nombre = nombre or DECODIFICADOR
+
+    def detectar(self, imagen):
+        futuro = self.ejecutor.submit(_detectar_en_proceso, self.nombre, imagen)
+        return [Deteccion(*d) for d in futuro.result()]
+
+class PipelineLector:
+    """Captura frames en un hilo y los decodifica en otro para no bloquear el hilo de Tk"""
+
+    def __init__(self, camara=None, decodificaciones_por_segundo=DECODIFICACIONES_POR_SEGUNDO,
+                 nombre="", resultados=None, decodificador=None):
+        self.nombre = nombre
+        self.camara = camara or ServicioCamara()
+        self.intervalo_decodificacion = 1.0 / decodificaciones_por_segundo
+        self.planificador = PlanificadorEscaneo(decodificador)
+
+        # Cola acotada a un solo frame: el más reciente siempre reemplaza al anterior
+        self.cola_frames = queue.Queue(maxsize=1)
+        # Eventos de escaneo que el hilo de Tk consume; puede compartirse entre cámaras
+        self.resultados = resultados if resultados is not None else queue.Queue()
+
+        # Métricas por cámara
+        self._capturas = deque(maxlen=60)
+        self._latencias = deque(maxlen=100)
+
+        self._ultimo_frame = None
+        self._lock = threading.Lock()
+        self._activo = threading.Event()
+        self._hilos = []
+        # Motivo por el que el decodificador no pudo crearse; detiene el escaneo
+        self.error = None
+
+    def iniciar(self):
+        if self._activo.is_set():
+            return
+        # Un hilo de captura anterior puede seguir soltando el dispositivo
+        for hilo in self._hilos:
+            hilo.join()
+        # La cámara se abre desde el hilo de captura: abrir un dispositivo puede tardar
+        self.error = None
+        self._activo.set()
+        self._hilos = [
+            threading.Thread(target=self._bucle_captura, daemon=True),
+            threading.Thread(target=self._bucle_decodificacion, daemon=True)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def detener(self):
+        # El hilo de captura cierra la cámara al salir: cerrarla desde aquí competiría con abrir()/leer()
+        self._activo.clear()
+        for hilo in self._hilos:
+            hilo.join(timeout=1.0)
+        self._hilos = [hilo for hilo in self._hilos if hilo.is_alive()]
+        with self._lock:
+            self._ultimo_frame = None
+
+    def activo(self):
+        return self._activo.is_set()
+
+    def ultimo_frame(self):
+        with self._lock:
+            return self._ultimo_frame
+
+    def estadisticas(self):
+        capturas = list(self._capturas)
+        fps = 0.0
+        if len(capturas) > 1 and capturas[-1] > capturas[0]:
+            fps = (len(capturas) - 1) / (capturas[-1] - capturas[0])
+        latencias = list(self._latencias)
+        return dict(self.planificador.estadisticas(),
+                    estado=self.error or self.camara.estado,
+                    fps=fps,
+                    latencia_ms=percentil(latencias, 50) if latencias else 0.0)
+
+    def _bucle_captura(self):
+        try:
+            while self._activo.is_set():
+                with METRICAS.medir('video.captura'):
+                    frame = self.camara.leer()
+                if frame is None:
+                    time.sleep(0.01)
+                    continue
+
+                marca = time.time()
+                self._capturas.append(time.monotonic())
+                with self._lock:
+                    self._ultimo_frame = frame
+                self._publicar((marca, frame))
+        finally:
+            # Solo este hilo usa el dispositivo, así que también es quien lo suelta
+            self.camara.cerrar()
+
+    def _publicar(self, captura):
+        # Descartar el frame pendiente para que la cola nunca acumule retraso
+        try:
+            self.cola_frames.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self.cola_frames.put_nowait(captura)
+        except queue.Full:
+            pass
+
+    def _bucle_decodificacion(self):
+        # Sin decodificador no hay nada que escanear: avisar una vez y dejar solo la vista previa
+        if self.planificador.decodificador is None:
+            try:
+                self.planificador.decodificador = crear_decodificador()
+            except Exception as e:
+                self.error = f"sin decodificador ({e})"
+                print(f"No se pudo crear el decodificador ({self.nombre}): {e}", file=sys.stderr)
+                return
+
+        while self._activo.is_set():
+            inicio = time.monotonic()
+            try:
+                marca, frame = self.cola_frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            decodificados = self.planificador.decodificados
+            inicio_decodificacion = time.perf_counter()
+            try:
+                leidos = self.planificador.decodificar(frame)
+            except Exception as e:
+                # Un fallo del decodificador no debe detener la cámara
+                print(f"Error al decodificar ({self.nombre}): {e}", file=sys.stderr)
+                leidos = []
+            # La latencia solo cuenta los frames que sí pasaron por el decodificador
+            if self.planificador.decodificados != decodificados:
+                self._latencias.append((time.monotonic() - inicio) * 1000)
+                METRICAS.registrar('video.decodificacion',
+                                   (time.perf_counter() - inicio_decodificacion) * 1000)
+
+            for datos in leidos:
+                self.resultados.put(EventoEscaneo(marca, self.nombre, datos))
+
+            # Limitar la tasa de decodificación de forma independiente a la vista previa
+            espera = self.intervalo_decodificacion - (time.monotonic() - inicio)
+            if espera > 0:
+                time.sleep(espera)
+
+class LectorMulticamara:
+    """Un PipelineLector por cámara, un pool de procesos decodificadores y un flujo de eventos ordenado"""
+
+    def __init__(self, camaras=None, procesos=PROCESOS_DECODIFICACION):
+        self.camaras = dict(camaras or CAMARAS)
+        self.procesos = procesos
+        self.resultados = queue.Queue()
+        self.lectores = {}
+        self._ejecutor = None
+        self._pendientes = []
+
+    def iniciar(self):
+        if self.lectores:
+            return
+
+        # Con una sola cámara se decodifica en su propio hilo, sin costo de copiar frames
+        decodificador = None
+        if len(self.camaras) > 1:
+            self._ejecutor = ProcessPoolExecutor(max_workers=self.procesos)
+            decodificador = DecodificadorRemoto(self._ejecutor)
+
+        for nombre, fuente in self.camaras.items():
+            lector = PipelineLector(ServicioCamara(fuente), nombre=nombre,
+                                    resultados=self.resultados, decodificador=decodificador)
+            lector.iniciar()
+            self.lectores[nombre] = lector
+
+    def detener(self):
+        for lector in self.lectores.values():
+            lector.detener()
+        self.lectores = {}
+        if self._ejecutor is not None:
+            self._ejecutor.shutdown(wait=False, cancel_futures=True)
+            self._ejecutor = None
+
+    def activo(self):
+        return bool(self.lectores)
+
+    def ultimo_frame(self, nombre):
+        lector = self.lectores.get(nombre)
+        return lector.ultimo_frame() if lector else None
+
+    def estadisticas(self):
+        return {nombre: lector.estadisticas() for nombre, lector in self.lectores.items()}
+
+    def eventos(self):
+        """Eventos listos, en orden de captura entre todas las cámaras"""
+        while True:
+            try:
+                heapq.heappush(self._pendientes, self.resultados.get_nowait())
+            except queue.Empty:
+                break
+
+        # Retener brevemente los eventos recientes por si otra cámara entrega uno anterior
+        limite = time.time() - VENTANA_ORDEN_MS / 1000.0
+        listos = []
+        while self._pendientes and self._pendientes[0].marca <= limite:
+            listos.append(heapq.heappop(self._pendientes))
+        return listos
+
+class RenderizadorVistaPrevia:
+    """Dibuja frames BGR en un Label reutilizando un único buffer RGBA, Image y PhotoImage.
+
+    Con label=None solo convierte los frames, para medir sin pantalla.
+    """
+
+    def __init__(self, label, tamano=TAMANO_VIDEO, frecuencia=FRECUENCIA_PANTALLA):
+        self.label = label
+        # La página programa su tick con este intervalo (ver intervalo_ms)
+        self.intervalo = 1.0 / min(frecuencia, FPS_VISTA_PREVIA)
+        self.tamano = None
+        self.foto = None
+        self._ultimo = 0.0
+
+        # Métricas de renderizado: solo contadores, nada que reservar por frame
+        self.renderizados = 0
+        self.omitidos = 0
+        self._tiempo_total = 0.0
+
+        self._reservar(tamano)
+
+    @property
+    def intervalo_ms(self):
+        return max(1, round(self.intervalo * 1000))
+
+    def _reservar(self, tamano):
+        import numpy as np
+        ancho, alto = tamano
+        self.tamano = tuple(tamano)
+        # La Image comparte la memoria del arreglo: cvtColor escribe directamente en ella
+        self._rgba = np.empty((alto, ancho, 4), dtype=np.uint8)
+        self._imagen = Image.frombuffer('RGBA', self.tamano, self._rgba, 'raw', 'RGBA', 0, 1)
+        self.foto = None
+
+    def preparar(self, frame):
+        """Convierte el frame dentro de los buffers existentes; no necesita Tk"""
+        import cv2
+        if frame.shape[1::-1] != self.tamano:
+            self._reservar(frame.shape[1::-1])
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA, dst=self._rgba)
+        return self._imagen
+
+    def renderizar(self, frame):
+        # El tick de la página ya marca el ritmo; esto solo evita dos dibujos en el mismo
+        # intervalo cuando after() se retrasa y luego se pone al día
+        ahora = time.monotonic()
+        if ahora - self._ultimo < self.intervalo / 2:
+            self.omitidos += 1
+            return False
+        self._ultimo = ahora
+
+        inicio = time.perf_counter()
+        imagen = self.preparar(frame)
+        if self.label is None:
+            # Sin interfaz (pruebas y benchmark): solo la conversión
+            pass
+        elif self.foto is None:
+            self.foto = ImageTk.PhotoImage(imagen)
+            self.label.configure(image=self.foto)
+        else:
+            # Actualizar en el lugar: sin nuevos objetos de imagen por frame
+            self.foto.paste(imagen)
+        self.renderizados += 1
+        self._tiempo_total += time.perf_counter() - inicio
+        return True
+
+    def limpiar(self):
+        if self.label is not None:
+            self.label.configure(image='')
+        self.foto = None
+
+    def estadisticas(self):
+        return {
+            'renderizados': self.renderizados,
+            'omitidos': self.omitidos,
+            'render_ms': self._tiempo_total * 1000 / self.renderizados if self.renderizados else 0.0
+        }
 
 class PaginaLogin(tk.Frame):
     def __init__(self, parent, controller):
@@ -258,6 +2740,22 @@ class PaginaNiveles(tk.Frame):
                               width=20)
         btn_consulta.pack(pady=10)
 
+        btn_importar = tk.Button(main_frame,
+                               text="Importar Alumnos",
+                               command=self.importar_alumnos,
+                               bg='#D4E6B5',  # Verde pastel
+                               font=("Arial", 14),
+                               width=20)
+        btn_importar.pack(pady=10)
+
+        btn_diagnostico = tk.Button(main_frame,
+                                  text="Diagnóstico",
+                                  command=lambda: controller.mostrar_frame(PaginaDiagnostico),
+                                  bg='#E3D7F4',  # Lavanda pastel
+                                  font=("Arial", 14),
+                                  width=20)
+        btn_diagnostico.pack(pady=10)
+
         # Botón de cerrar sesión
         btn_cerrar = tk.Button(main_frame,
                              text="Cerrar Sesión",
@@ -267,8 +2765,76 @@ class PaginaNiveles(tk.Frame):
                              width=20)
         btn_cerrar.pack(pady=20)
 
+    def importar_alumnos(self):
+        ruta = filedialog.askopenfilename(
+            filetypes=[("Listas de alumnos", "*.csv *.xlsx")]
+        )
+        if not ruta:
+            return
+        carpeta_fotos = filedialog.askdirectory(title="Carpeta de fotografías (opcional)") or None
+
+        # Ventana de progreso; la importación corre en un hilo con su propia conexión
+        ventana = tk.Toplevel(self)
+        ventana.title("Importando alumnos")
+        ventana.configure(bg='white')
+        estado = tk.Label(ventana, text="Iniciando...", bg='white', font=("Arial", 12))
+        estado.pack(padx=20, pady=20)
+
+        mensajes = queue.Queue()
+        # Existe antes que el hilo: Cancelar funciona aunque el importador aún no se haya creado
+        cancelado = threading.Event()
+
+        def progreso(procesadas, insertados, errores):
+            mensajes.put(('progreso', f"Filas: {procesadas}  Guardadas: {insertados}  Errores: {errores}"))
+
+        def ejecutar():
+            conexion = self.controller.bd.nueva_conexion()
+            try:
+                importador = ImportadorAlumnos(conexion, self.controller.indice_credenciales,
+                                               carpeta_fotos, progreso=progreso, cancelado=cancelado)
+                mensajes.put(('fin', importador.importar(ruta)))
+            except Exception as e:
+                mensajes.put(('error', str(e)))
+            finally:
+                self.controller.bd.cerrar_conexion(conexion)
+
+        def cancelar():
+            cancelado.set()
+            estado.configure(text="Cancelando...")
+
+        tk.Button(ventana, text="Cancelar", command=cancelar,
+                  bg='#FFB5B5', font=("Arial", 12)).pack(pady=(0, 20))
+
+        def revisar():
+            while True:
+                try:
+                    tipo, valor = mensajes.get_nowait()
+                except queue.Empty:
+                    break
+                if tipo == 'progreso':
+                    if not cancelado.is_set():
+                        estado.configure(text=valor)
+                    continue
+
+                ventana.destroy()
+                # Filas nuevas en grupos arbitrarios: ninguna consulta guardada sigue vigente
+                self.controller.invalidar_consultas()
+                if tipo == 'error':
+                    messagebox.showerror("Error", f"Error al importar: {valor}")
+                    return
+                insertados, errores = valor
+                resumen = f"Alumnos importados: {insertados}\nFilas con error: {len(errores)}"
+                for fila, mensaje in errores[:10]:
+                    resumen += f"\n  Fila {fila}: {mensaje}"
+                messagebox.showinfo("Importación terminada", resumen)
+                return
+            self.after(100, revisar)
+
+        threading.Thread(target=ejecutar, daemon=True).start()
+        self.after(100, revisar)
+
     def seleccionar_nivel(self, nivel):
-        self.controller.frames[PaginaRegistro].nivel_seleccionado = nivel
+        self.controller.obtener_frame(PaginaRegistro).nivel_seleccionado = nivel
         self.controller.mostrar_frame(PaginaRegistro)
 
 class PaginaRegistro(tk.Frame):
@@ -278,6 +2844,10 @@ class PaginaRegistro(tk.Frame):
         self.controller = controller
         self.nivel_seleccionado = ""
         self.foto_path = None
+        self.foto_procesada = None
+
+        # La foto se procesa en un hilo aparte; el resultado vuelve por esta cola
+        self.cola_fotos = queue.Queue()
         
         # Variables
         self.nivel_var = tk.StringVar()
@@ -355,12 +2925,12 @@ class PaginaRegistro(tk.Frame):
                            font=("Arial", 12))
         btn_foto.pack(pady=10)
 
-        btn_guardar = tk.Button(registro_frame,
-                              text="Guardar",
-                              command=self.guardar_registro,
-                              bg='#D4E6B5',
-                              font=("Arial", 12))
-        btn_guardar.pack(pady=10)
+        self.btn_guardar = tk.Button(registro_frame,
+                                   text="Guardar",
+                                   command=self.guardar_registro,
+                                   bg='#D4E6B5',
+                                   font=("Arial", 12))
+        self.btn_guardar.pack(pady=10)
 
         btn_regresar = tk.Button(registro_frame,
                                text="Regresar",
@@ -382,16 +2952,6 @@ class PaginaRegistro(tk.Frame):
             self.combo_grado.current(0)
             self.grupo_var.set('A')  # Establecer grupo por defecto
             
-    def verificar_cupo(self):
-        cursor = self.controller.conexion.cursor()
-        cursor.execute('''
-            SELECT COUNT(*) FROM alumnos 
-            WHERE nivel = ? AND grado = ? AND grupo = ?
-        ''', (self.nivel_seleccionado, self.anio_var.get(), self.grupo_var.get()))
-        
-        cantidad_alumnos = cursor.fetchone()[0]
-        return cantidad_alumnos < 45
-
     def subir_foto(self):
         self.foto_path = filedialog.askopenfilename(
             filetypes=[
@@ -409,13 +2969,44 @@ class PaginaRegistro(tk.Frame):
                 )
                 self.foto_path = None
                 return
-                
-            # Mostrar preview
-            image = Image.open(self.foto_path)
-            image.thumbnail((150, 150))  # Resize para preview
-            photo = ImageTk.PhotoImage(image)
-            self.foto_label.configure(image=photo, text="")
-            self.foto_label.image = photo
+
+            # Decodificar y reducir fuera del hilo de Tk
+            self.foto_procesada = None
+            self.foto_label.configure(image="", text="Procesando foto...")
+            self.foto_label.image = None
+            threading.Thread(target=self._procesar_foto, args=(self.foto_path,), daemon=True).start()
+            self.after(50, self._revisar_foto)
+
+    def _procesar_foto(self, ruta):
+        try:
+            self.cola_fotos.put((ruta, procesar_foto(ruta), None))
+        except Exception as e:
+            self.cola_fotos.put((ruta, None, e))
+
+    def _revisar_foto(self):
+        try:
+            ruta, foto, error = self.cola_fotos.get_nowait()
+        except queue.Empty:
+            self.after(50, self._revisar_foto)
+            return
+
+        # Ignorar resultados de una foto que ya fue reemplazada
+        if ruta != self.foto_path:
+            return
+
+        if error is not None:
+            self.foto_path = None
+            self.foto_label.configure(image="", text="Sin foto seleccionada")
+            messagebox.showerror("Error", f"No se pudo procesar la imagen: {error}")
+            return
+
+        # Mostrar preview
+        self.foto_procesada = foto
+        photo = ImageTk.PhotoImage(foto.vista_previa)
+        ahorro = foto.bytes_ahorrados() / 1024
+        self.foto_label.configure(image=photo, compound='top',
+                                  text=f"{len(foto.datos) / 1024:.0f} KB (ahorro {ahorro:.0f} KB)")
+        self.foto_label.image = photo
 
     def guardar_registro(self):
         try:
@@ -429,43 +3020,56 @@ class PaginaRegistro(tk.Frame):
                        self.foto_path]):
                 raise ValueError("Todos los campos son obligatorios")
 
-            # Verificar matrícula única
-            cursor = self.controller.conexion.cursor()
-            cursor.execute('SELECT id FROM alumnos WHERE matricula = ?', 
-                         (self.matricula_var.get(),))
-            if cursor.fetchone():
-                raise ValueError("La matrícula ya existe en el sistema")
+            if self.foto_procesada is None:
+                raise ValueError("La foto aún se está procesando")
+
+            # Imagen ya reducida y recodificada por procesar_foto
+            foto_binaria = self.foto_procesada.datos
 
-            # Procesar imagen
-            with open(self.foto_path, 'rb') as file:
-                foto_binaria = file.read()
+            try:
+                edad = int(self.edad_var.get())
+            except ValueError:
+                raise ValueError("La edad debe ser un número entero")
 
             # Generar código de barras único
             codigo_barras = f"{self.nivel_var.get()}_{self.grado_var.get()}_{self.matricula_var.get()}"
-
-            # Guardar en base de datos
-            self.controller.guardar_alumno((
+            datos = (
                 self.matricula_var.get(),
                 self.nombre_var.get(),
-                int(self.edad_var.get()),
+                edad,
                 self.nivel_var.get(),
                 self.grado_var.get(),
                 self.grupo_var.get(),
                 codigo_barras,
                 foto_binaria,
                 datetime.now()
-            ))
+            )
+
+            # Cupo, matrícula única e inserción se resuelven en el hilo de escritura
+            self.btn_guardar.configure(state='disabled')
+            self.controller.guardar_alumno(datos,
+                                           al_terminar=lambda alumno_id: self.registro_guardado(codigo_barras),
+                                           al_fallar=self.registro_fallido)
 
-            # Mostrar código QR
-            self.mostrar_codigo_qr(codigo_barras)
-            
-            messagebox.showinfo("Éxito", "Alumno registrado correctamente")
-            self.limpiar_campos()
-            
-        except ValueError as e:
-            messagebox.showerror("Error", str(e))
         except Exception as e:
-            messagebox.showerror("Error", f"Error al guardar: {str(e)}")
+            # Si el guardado no llegó a enviarse, el formulario debe poder intentarlo de nuevo
+            self.registro_fallido(e)
+
+    def registro_guardado(self, codigo_barras):
+        self.btn_guardar.configure(state='normal')
+
+        # Mostrar código QR
+        self.mostrar_codigo_qr(codigo_barras)
+
+        messagebox.showinfo("Éxito", "Alumno registrado correctamente")
+        self.limpiar_campos()
+
+    def registro_fallido(self, error):
+        self.btn_guardar.configure(state='normal')
+        if isinstance(error, ValueError):
+            messagebox.showerror("Error", str(error))
+        else:
+            messagebox.showerror("Error", f"Error al guardar: {str(error)}")
             
     def mostrar_codigo_qr(self, codigo):
         # Crear una nueva ventana para mostrar el código QR
@@ -474,12 +3078,8 @@ class PaginaRegistro(tk.Frame):
         qr_window.geometry("400x500")
         qr_window.configure(bg='white')
 
-        # Generar QR
-        import qrcode
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(codigo)
-        qr.make(fit=True)
-        qr_image = qr.make_image(fill_color="black", back_color="white")
+        # Generar QR (o tomarlo de la caché)
+        qr_image = self.controller.credenciales.imagen_qr(codigo)
         
         # Convertir para Tkinter
         qr_image = ImageTk.PhotoImage(qr_image)
@@ -507,6 +3107,7 @@ class PaginaRegistro(tk.Frame):
         self.edad_var.set("")
         self.grado_var.set("")
         self.foto_path =self.foto_path = None
+        self.foto_procesada = None
         self.foto_label.configure(image="", text="Sin foto seleccionada")
         self.foto_label.image = None
 
@@ -528,10 +3129,22 @@ class PaginaLectorQR(tk.Frame):
         video_frame = tk.Frame(left_frame, bg='white', relief=tk.GROOVE, bd=2)
         video_frame.pack(fill='both', expand=True)
         
+        # Selector de la cámara que se muestra (todas se leen siempre)
+        self.camara_vista = tk.StringVar(value=next(iter(CAMARAS)))
+        if len(CAMARAS) > 1:
+            ttk.Combobox(video_frame,
+                         textvariable=self.camara_vista,
+                         values=list(CAMARAS),
+                         state='readonly').pack(padx=10, pady=(10, 0))
+
         # Label para video
         self.video_label = tk.Label(video_frame, bg='black')
         self.video_label.pack(padx=10, pady=10)
 
+        # Estadísticas del planificador de escaneo
+        self.estado_label = tk.Label(video_frame, bg='white', font=("Arial", 9))
+        self.estado_label.pack(pady=(0, 10))
+
         # Botón de regresar debajo de la cámara
         btn_regresar = tk.Button(left_frame,
                                text="← Regresar al Menú Principal",
@@ -596,41 +3209,113 @@ class PaginaLectorQR(tk.Frame):
                     'label': info_label,
                     'boton': btn_retiro,
                     'ocupado': False,
-                    'alumno_id': None
+                    'alumno_id': None,
+                    'miniatura': None
                 })
             self.casillas.append(fila)
 
-        # Iniciar captura de video
-        self.captura = cv2.VideoCapture(0)
-        self.actualizar_video()
+        # Evitar procesar el mismo código en cada frame mientras se sostiene la credencial
+        self.filtro = FiltroDuplicados()
+
+        # La captura y la decodificación corren en segundo plano solo mientras la página está visible
+        self.lector = LectorMulticamara()
+        self.renderizador = RenderizadorVistaPrevia(self.video_label)
+        self.frame_mostrado = None
+        self.tarea_video = None
+
+    def al_mostrar(self):
+        self.lector.iniciar()
+        if self.tarea_video is None:
+            self.actualizar_video()
+
+    def al_ocultar(self):
+        if self.tarea_video is not None:
+            self.after_cancel(self.tarea_video)
+            self.tarea_video = None
+        self.lector.detener()
+        self.frame_mostrado = None
+        self.renderizador.limpiar()  # Limpiar el label de video
 
     def actualizar_video(self):
-        if hasattr(self, 'captura') and self.captura.isOpened():
-            ret, frame = self.captura.read()
-            if ret:
-                # Redimensionar el frame para que tenga un tamaño razonable
-                frame = cv2.resize(frame, (480, 360))  # Ajusta estos valores según necesites
-                
-                # Buscar códigos QR/Barras
-                codigos = decode(frame)
-                for codigo in codigos:
-                    datos = codigo.data.decode('utf-8')
-                    self.procesar_codigo(datos)
-
-                # Convertir frame para Tkinter
-                cv2image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA)
-                img = Image.fromarray(cv2image)
-                imgtk = ImageTk.PhotoImage(image=img)
-                self.video_label.imgtk = imgtk
-                self.video_label.configure(image=imgtk)
-            
-            self.video_label.after(10, self.actualizar_video)
+        if self.lector.activo():
+            with METRICAS.medir('video.tick'):
+                # Consumir los códigos de todas las cámaras en orden de captura
+                for evento in self.lector.eventos():
+                    self.procesar_codigo(evento.datos)
+
+                # Mostrar solo si llegó un frame nuevo desde el último tick
+                frame = self.lector.ultimo_frame(self.camara_vista.get())
+                if frame is not None and frame is not self.frame_mostrado:
+                    if self.renderizador.renderizar(frame):
+                        self.frame_mostrado = frame
+
+                self.estado_label.configure(text="\n".join(
+                    f"{nombre}: {stats['estado']}  {stats['fps']:.0f} fps  "
+                    f"{stats['latencia_ms']:.0f} ms  Decodificados: {stats['decodificados']}  "
+                    f"Omitidos: {stats['omitidos']}"
+                    for nombre, stats in self.lector.estadisticas().items()))
+
+            self.tarea_video = self.after(self.renderizador.intervalo_ms, self.actualizar_video)
             
+    def procesar_codigo(self, datos):
+        with METRICAS.medir('lector.procesar_codigo'):
+            alumno = registrar_lectura(datos, self.filtro, self.controller.indice_credenciales,
+                                       self.controller.escritor_registros)
+            if alumno is not None:
+                self.mostrar_alumno(alumno)
+
+    def mostrar_alumno(self, alumno):
+        # La entrada ya quedó registrada: el tablero solo la muestra si hay casilla libre
+        alumno_id, nombre, nivel, grado, grupo = alumno
+
+        # Ignorar si el alumno ya ocupa una casilla
+        libre = None
+        for fila in self.casillas:
+            for casilla in fila:
+                if casilla['alumno_id'] == alumno_id:
+                    return
+                if libre is None and not casilla['ocupado']:
+                    libre = casilla
+
+        if libre is None:
+            return
+
+        libre['label'].configure(text=f"{nombre}\n{nivel} - {grado} {grupo}")
+        libre['boton'].configure(state='normal')
+        libre['ocupado'] = True
+        libre['alumno_id'] = alumno_id
+        self.cargar_miniatura(libre, alumno_id)
+
+    def cargar_miniatura(self, casilla, alumno_id):
+        # La miniatura ya está generada en el almacén: se lee en el hilo de consultas
+        def leer(conexion):
+            fila = conexion.execute('SELECT foto_hash FROM alumnos WHERE id = ?', (alumno_id,)).fetchone()
+            if fila is None or fila[0] is None:
+                return None
+            return AlmacenFotos(conexion).miniatura(fila[0], TAMANOS_MINIATURA[0])
+
+        self.controller.consultas.enviar(
+            leer, al_terminar=lambda datos: self.mostrar_miniatura(casilla, alumno_id, datos))
+
+    def mostrar_miniatura(self, casilla, alumno_id, datos):
+        # El alumno pudo retirarse mientras se leía la foto
+        if datos is None or casilla['alumno_id'] != alumno_id:
+            return
+        casilla['miniatura'] = ImageTk.PhotoImage(Image.open(io.BytesIO(datos)))
+        casilla['label'].configure(image=casilla['miniatura'], compound='top')
+
+    def retirar_alumno(self, x, y):
+        casilla = self.casillas[x][y]
+        if casilla['alumno_id'] is not None:
+            self.controller.escritor_registros.registrar(casilla['alumno_id'], 'salida')
+        casilla['label'].configure(text="Espacio Disponible", image='')
+        casilla['boton'].configure(state='disabled')
+        casilla['ocupado'] = False
+        casilla['alumno_id'] = None
+        casilla['miniatura'] = None
+
     def cerrar_camara(self, controller):
-        if hasattr(self, 'captura'):
-            self.captura.release()
-            cv2.destroyAllWindows()  # Cerrar todas las ventanas de OpenCV
-        self.video_label.config(image='')  # Limpiar el label de video
+        # Al ocultarse la página se suelta la cámara (ver al_ocultar)
         controller.mostrar_frame(PaginaNiveles)  # Regresar al menú principal
 
 class PaginaConsulta(tk.Frame):
@@ -643,6 +3328,8 @@ class PaginaConsulta(tk.Frame):
         self.nivel_var = tk.StringVar()
         self.anio_var = tk.StringVar()
         self.grupo_var = tk.StringVar()
+        self.busqueda_var = tk.StringVar()
+        self.busqueda_pendiente = None
 
         # Configurar grid responsivo
         self.grid_rowconfigure(0, weight=1)
@@ -701,16 +3388,39 @@ class PaginaConsulta(tk.Frame):
         busqueda_frame = tk.Frame(main_frame, bg='white')
         busqueda_frame.pack(fill='x', padx=20, pady=10)
 
+        tk.Label(busqueda_frame, text="Nombre o matrícula:", bg='white').pack(side=tk.LEFT, padx=5)
+        tk.Entry(busqueda_frame, textvariable=self.busqueda_var,
+                 font=("Arial", 12)).pack(side=tk.LEFT, padx=5, fill='x', expand=True)
+        self.busqueda_var.trace_add('write', self.programar_busqueda)
+        for variable in (self.nivel_var, self.anio_var, self.grupo_var):
+            variable.trace_add('write', self.descartar_busqueda)
+
         
-        # Configurar TreeView
-        self.tree = ttk.Treeview(main_frame, 
-                                columns=("Matrícula", "Nombre", "Edad", "Grupo","Fecha registro"))
+        # Configurar TreeView virtualizado: solo contiene las filas visibles
+        tabla_frame = tk.Frame(main_frame, bg='#F5E6E8')
+        tabla_frame.pack(pady=20, padx=20, fill='both', expand=True)
+
+        self.tree = ttk.Treeview(tabla_frame, 
+                                columns=("Matrícula", "Nombre", "Edad", "Grupo","Fecha registro"),
+                                height=FILAS_VISIBLES_CONSULTA)
         self.tree.heading("Matrícula", text="Matrícula")
         self.tree.heading("Nombre", text="Nombre")
         self.tree.heading("Edad", text="Edad")
         self.tree.heading("Grupo", text="Grupo")
         self.tree.heading("Fecha registro", text="Fecha registro")
-        self.tree.pack(pady=20, padx=20, fill='both', expand=True)
+        self.tree.pack(side=tk.LEFT, fill='both', expand=True)
+
+        self.scrollbar = ttk.Scrollbar(tabla_frame, orient=tk.VERTICAL, command=self.desplazar)
+        self.scrollbar.pack(side=tk.RIGHT, fill='y')
+        # Windows y macOS envían <MouseWheel> con delta de magnitud variable (pequeña en trackpads):
+        # solo cuenta el signo. X11 envía <Button-4>/<Button-5>
+        self.tree.bind('<MouseWheel>', self.rueda)
+        self.tree.bind('<Button-4>', lambda e: self.desplazar('scroll', -3, 'units'))
+        self.tree.bind('<Button-5>', lambda e: self.desplazar('scroll', 3, 'units'))
+
+        self.consulta = None
+        self.total_filas = 0
+        self.primera_fila = 0
         
          # Añadir botón de búsqueda
         self.btn_buscar = tk.Button(filtros_frame,
@@ -720,46 +3430,260 @@ class PaginaConsulta(tk.Frame):
                                   font=("Arial", 12))
         self.btn_buscar.pack(side=tk.LEFT, padx=20)
 
-    def buscar_registros(self):
-        # Limpiar tabla actual
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        btn_credenciales = tk.Button(filtros_frame,
+                                   text="Imprimir credenciales",
+                                   command=self.imprimir_credenciales,
+                                   bg='#B5C7D4',
+                                   font=("Arial", 12))
+        btn_credenciales.pack(side=tk.LEFT, padx=5)
+
+        btn_exportar = tk.Button(filtros_frame,
+                               text="Exportar",
+                               command=self.exportar_datos,
+                               bg='#E3D7F4',
+                               font=("Arial", 12))
+        btn_exportar.pack(side=tk.LEFT, padx=5)
+
+    def exportar_datos(self):
+        # Los filtros de nivel/grado/grupo actuales se aplican a la exportación
+        ventana = tk.Toplevel(self)
+        ventana.title("Exportar datos")
+        ventana.configure(bg='white')
+
+        conjuntos = {"Alumnos": 'alumnos', "Entradas y salidas": 'registros',
+                     "Asistencia diaria": 'asistencia'}
+        conjunto_var = tk.StringVar(value="Alumnos")
+        copiar_fotos = tk.BooleanVar(value=False)
+
+        tk.Label(ventana, text="Datos:", bg='white', font=("Arial", 12)).pack(padx=20, pady=(20, 5))
+        ttk.Combobox(ventana, textvariable=conjunto_var, values=list(conjuntos),
+                     state='readonly').pack(padx=20)
+        tk.Checkbutton(ventana, text="Copiar fotografías a una carpeta", variable=copiar_fotos,
+                       bg='white').pack(padx=20, pady=10)
+        estado = tk.Label(ventana, text="", bg='white', font=("Arial", 12))
+        estado.pack(padx=20, pady=5)
+
+        mensajes = queue.Queue()
+        # Compartido con el exportador: se puede cancelar aunque el hilo aún no lo haya creado
+        cancelado = threading.Event()
+        iniciada = False
+
+        def progreso(exportadas, total):
+            mensajes.put(('progreso', f"Filas: {exportadas} de {total}"))
+
+        def iniciar():
+            ruta = filedialog.asksaveasfilename(
+                parent=ventana,
+                defaultextension=".csv",
+                filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet")]
+            )
+            if not ruta:
+                return
+            # Las variables de Tk se leen aquí: el hilo de exportación no debe tocarlas
+            conjunto = conjuntos[conjunto_var.get()]
+            carpeta_fotos = None
+            if copiar_fotos.get() and conjunto == 'alumnos':
+                carpeta_fotos = filedialog.askdirectory(parent=ventana, title="Carpeta para las fotografías")
+                if not carpeta_fotos:
+                    return
+
+            nonlocal iniciada
+            iniciada = True
+            btn_iniciar.configure(state='disabled')
+            estado.configure(text="Iniciando...")
+            filtros = (self.nivel_var.get(), self.anio_var.get(), self.grupo_var.get())
+
+            def ejecutar():
+                conexion = self.controller.bd.nueva_lectura()
+                try:
+                    exportador = ExportadorDatos(conexion, conjunto, *filtros, carpeta_fotos=carpeta_fotos,
+                                                 progreso=progreso, cancelado=cancelado)
+                    mensajes.put(('fin', exportador.exportar(ruta)))
+                except Exception as e:
+                    mensajes.put(('error', str(e)))
+                finally:
+                    self.controller.bd.cerrar_conexion(conexion)
+
+            threading.Thread(target=ejecutar, daemon=True).start()
+            self.after(100, revisar)
+
+        def cancelar():
+            # Con la exportación en curso se espera su fin: ella borra el archivo temporal
+            if iniciada:
+                cancelado.set()
+                estado.configure(text="Cancelando...")
+            else:
+                ventana.destroy()
+
+        btn_iniciar = tk.Button(ventana, text="Exportar", command=iniciar,
+                                bg='#D4E6B5', font=("Arial", 12))
+        btn_iniciar.pack(pady=5)
+        tk.Button(ventana, text="Cancelar", command=cancelar,
+                  bg='#FFB5B5', font=("Arial", 12)).pack(pady=(0, 20))
+        ventana.protocol("WM_DELETE_WINDOW", cancelar)
+
+        def revisar():
+            if not ventana.winfo_exists():
+                return
+            while True:
+                try:
+                    tipo, valor = mensajes.get_nowait()
+                except queue.Empty:
+                    break
+                if tipo == 'progreso':
+                    if not cancelado.is_set():
+                        estado.configure(text=valor)
+                    continue
+
+                ventana.destroy()
+                if tipo == 'error':
+                    messagebox.showerror("Error", f"Error al exportar: {valor}")
+                elif valor is None:
+                    messagebox.showinfo("Exportación cancelada", "No se generó ningún archivo")
+                else:
+                    messagebox.showinfo("Éxito", f"Filas exportadas: {valor}")
+                return
+            self.after(100, revisar)
 
-        # Validar que se haya seleccionado al menos el nivel
+    def imprimir_credenciales(self):
         if not self.nivel_var.get():
             messagebox.showwarning("Advertencia", "Por favor seleccione al menos el nivel educativo")
             return
+        ruta = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF", "*.pdf"), ("Imágenes PNG", "*.png")]
+        )
+        if not ruta:
+            return
 
-        # Construir consulta SQL
-        consulta = '''
-            SELECT matricula, nombre, edad, nivel, grado, grupo, fecha_registro
-            FROM alumnos
-            WHERE nivel = ?
-        '''
-        parametros = [self.nivel_var.get()]
+        nivel, grado, grupo = self.nivel_var.get(), self.anio_var.get(), self.grupo_var.get()
+        resultado = queue.Queue()
 
-        if self.anio_var.get():
-            consulta += " AND grado = ?"
-            parametros.append(self.anio_var.get())
-        
-        if self.grupo_var.get():
-            consulta += " AND grupo = ?"
-            parametros.append(self.grupo_var.get())
+        def ejecutar():
+            # Hilo de un solo uso: su conexión se cierra al terminar
+            conexion = self.controller.bd.nueva_lectura()
+            try:
+                alumnos = alumnos_para_credenciales(conexion, nivel, grado, grupo)
+                resultado.put((self.controller.credenciales.exportar(alumnos, ruta), None))
+            except Exception as e:
+                resultado.put((None, e))
+            finally:
+                self.controller.bd.cerrar_conexion(conexion)
 
-        consulta += " ORDER BY nombre"
+        def revisar():
+            try:
+                hojas, error = resultado.get_nowait()
+            except queue.Empty:
+                self.after(100, revisar)
+                return
+            if error is not None:
+                messagebox.showerror("Error", f"Error al generar credenciales: {error}")
+            elif not hojas:
+                messagebox.showinfo("Información", "No se encontraron registros")
+            else:
+                messagebox.showinfo("Éxito", f"Credenciales generadas: {hojas} hoja(s)")
 
-        # Ejecutar consulta
-        cursor = self.controller.conexion.cursor()
-        cursor.execute(consulta, parametros)
-        resultados = cursor.fetchall()
-        
-        # Mostrar resultados
-        if resultados:
-            for resultado in resultados:
-                self.tree.insert("", "end", values=resultado)
-        else:
+        threading.Thread(target=ejecutar, daemon=True).start()
+        self.after(100, revisar)
+
+    def programar_busqueda(self, *args):
+        # Esperar a que el usuario deje de escribir antes de consultar
+        if self.busqueda_pendiente is not None:
+            self.after_cancel(self.busqueda_pendiente)
+        self.busqueda_pendiente = self.after(ESPERA_BUSQUEDA_MS,
+                                             lambda: self.buscar_registros(interactivo=False))
+
+    def buscar_registros(self, interactivo=True):
+        self.busqueda_pendiente = None
+        texto = self.busqueda_var.get()
+
+        # Validar que se haya seleccionado al menos el nivel o escrito un nombre
+        if not self.nivel_var.get() and not expresion_busqueda(texto):
+            if interactivo:
+                messagebox.showwarning("Advertencia", "Por favor seleccione al menos el nivel educativo")
+            else:
+                self.descartar_busqueda()
+                self.consulta = None
+                self.total_filas = 0
+                self.mostrar_filas(0, [])
+            return
+
+        # La consulta corre en el hilo de consultas; una búsqueda nueva reemplaza a la anterior
+        self.controller.consultas.cancelar('ventana')
+        self.controller.consultas.enviar(abrir_consulta,
+                                         self.nivel_var.get(),
+                                         self.anio_var.get(),
+                                         self.grupo_var.get(),
+                                         texto,
+                                         FILAS_VISIBLES_CONSULTA,
+                                         self.controller.cache_consultas,
+                                         grupo='consulta',
+                                         al_terminar=lambda r: self.resultados_listos(r, interactivo),
+                                         al_fallar=self.busqueda_fallida)
+
+    def resultados_listos(self, resultado, interactivo):
+        self.consulta, self.total_filas, filas = resultado
+        self.mostrar_filas(0, filas)
+
+        if not self.total_filas and interactivo:
             messagebox.showinfo("Información", "No se encontraron registros")
-        
+
+    def busqueda_fallida(self, error):
+        messagebox.showerror("Error", f"Error al consultar: {error}")
+
+    def descartar_busqueda(self, *args):
+        # Los resultados de filtros que ya cambiaron no deben llegar a la tabla
+        self.controller.consultas.cancelar('consulta')
+        self.controller.consultas.cancelar('ventana')
+
+    def rueda(self, event):
+        if event.delta:
+            self.desplazar('scroll', -3 if event.delta > 0 else 3, 'units')
+
+    def desplazar(self, accion, cantidad, unidad=None):
+        """Interpreta los comandos de la barra de desplazamiento y de la rueda del ratón"""
+        if self.consulta is None:
+            return
+        if accion == 'moveto':
+            inicio = int(float(cantidad) * self.total_filas)
+        elif unidad == 'pages':
+            inicio = self.primera_fila + int(cantidad) * FILAS_VISIBLES_CONSULTA
+        else:
+            inicio = self.primera_fila + int(cantidad)
+
+        inicio = max(0, min(inicio, self.total_filas - FILAS_VISIBLES_CONSULTA))
+        if inicio != self.primera_fila:
+            self.primera_fila = inicio
+            self.mostrar_ventana()
+
+    def mostrar_ventana(self):
+        # Las páginas se leen en el hilo de consultas con la conexión de la propia consulta
+        consulta, inicio = self.consulta, self.primera_fila
+        cache = self.controller.cache_consultas
+
+        def leer(conexion):
+            filas = consulta.filas(inicio, FILAS_VISIBLES_CONSULTA)
+            # Las páginas nuevas cuentan para el tope de memoria de la caché
+            cache.actualizar(consulta)
+            return filas
+
+        self.controller.consultas.enviar(leer, grupo='ventana',
+                                         al_terminar=lambda filas: self.mostrar_filas(inicio, filas),
+                                         al_fallar=self.busqueda_fallida)
+
+    def mostrar_filas(self, inicio, filas):
+        # Reemplazar el contenido visible de una sola vez
+        self.primera_fila = inicio
+        self.tree.delete(*self.tree.get_children())
+        for fila in filas:
+            self.tree.insert("", "end", values=fila)
+
+        if self.total_filas:
+            self.scrollbar.set(inicio / self.total_filas,
+                               (inicio + len(filas)) / self.total_filas)
+        else:
+            self.scrollbar.set(0, 1)
+
     def actualizar_años(self, event=None):
         grados = {
             "Preescolar": ["1er año", "2do año", "3er año"],
@@ -770,52 +3694,1066 @@ class PaginaConsulta(tk.Frame):
         if self.combo_año['values']:
             self.combo_año.current(0)
 
-        
+class PaginaDiagnostico(tk.Frame):
+    """Latencias y ritmo de las rutas críticas, actualizados mientras la página está visible"""
 
-    def buscar_registros(self):
-        # Limpiar tabla actual
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+    def __init__(self, parent, controller):
+        tk.Frame.__init__(self, parent)
+        self.configure(bg='#F5E6E8')
+        self.controller = controller
+        self.tarea_actualizar = None
 
-       # Construir consulta SQL
-        consulta = '''
-            SELECT matricula, nombre, edad, grupo
-            FROM alumnos
-            WHERE nivel = ? AND grado = ? AND grupo = ?
-        '''
-        
-        cursor = self.controller.conexion.cursor()
-        cursor.execute(consulta, (
-            self.nivel_var.get(),
-            self.anio_var.get(),
-            self.grupo_var.get()
-        ))
-        
-        resultados = cursor.fetchall()
-        for resultado in resultados:
-            self.tree.insert("", "end", values=resultado)
-            
-        parametros = []
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        main_frame = tk.Frame(self, bg='#F5E6E8')
+        main_frame.place(relx=0.5, rely=0.5, anchor='center')
+
+        tk.Label(main_frame,
+                text="Diagnóstico de Rendimiento",
+                font=("Arial", 24, "bold"),
+                bg='#F5E6E8',
+                fg='#6B4E71').pack(pady=20)
 
-        if self.busqueda_nombre.get():
-            consulta += " AND a.nombre LIKE ?"
-            parametros.append(f"%{self.busqueda_nombre.get()}%")
+        botones_frame = tk.Frame(main_frame, bg='#F5E6E8')
+        botones_frame.pack(pady=10)
 
-        if self.combo_nivel.get() != "Todos":
-            consulta += " AND a.nivel = ?"
-            parametros.append(self.combo_nivel.get())
+        tk.Button(botones_frame,
+                 text="← Regresar",
+                 command=lambda: controller.mostrar_frame(PaginaNiveles),
+                 bg='#FFB5B5',
+                 font=("Arial", 12),
+                 padx=10,
+                 pady=5).pack(side=tk.LEFT, padx=5)
 
-        # Ejecutar consulta
-        cursor = self.controller.conexion.cursor()
-        cursor.execute(consulta, parametros)
-        resultados = cursor.fetchall()
+        tk.Button(botones_frame,
+                 text="Guardar métricas",
+                 command=self.guardar_metricas,
+                 bg='#D4E6B5',
+                 font=("Arial", 12),
+                 padx=10,
+                 pady=5).pack(side=tk.LEFT, padx=5)
 
-        # Mostrar resultados
-        for resultado in resultados:
-            ultima_entrada = resultado[4] if resultado[4] else "Sin registro"
-            self.tree.insert("", "end", values=resultado[:4] + (ultima_entrada,))
+        tk.Button(botones_frame,
+                 text="Reiniciar",
+                 command=self.reiniciar,
+                 bg='#B5C7D4',
+                 font=("Arial", 12),
+                 padx=10,
+                 pady=5).pack(side=tk.LEFT, padx=5)
+
+        self.estado_label = tk.Label(main_frame, bg='#F5E6E8', font=("Arial", 11))
+        self.estado_label.pack(pady=5)
+
+        self.tree = ttk.Treeview(main_frame,
+                                columns=("Conteo", "Por seg.", "p50 ms", "p95 ms", "p99 ms"),
+                                height=15)
+        self.tree.heading("#0", text="Métrica")
+        for columna in ("Conteo", "Por seg.", "p50 ms", "p95 ms", "p99 ms"):
+            self.tree.heading(columna, text=columna)
+            self.tree.column(columna, width=90, anchor='e')
+        self.tree.column("#0", width=240)
+        self.tree.pack(pady=10, padx=20, fill='both', expand=True)
+
+    def al_mostrar(self):
+        if self.tarea_actualizar is None:
+            self.actualizar()
+
+    def al_ocultar(self):
+        if self.tarea_actualizar is not None:
+            self.after_cancel(self.tarea_actualizar)
+            self.tarea_actualizar = None
+
+    def actualizar(self):
+        if not METRICAS.activas:
+            self.estado_label.configure(text="La instrumentación está desactivada")
+            self.tarea_actualizar = None
+            return
+
+        resumen = METRICAS.resumen()
+        self.tree.delete(*self.tree.get_children())
+        for nombre, datos in resumen['tiempos'].items():
+            self.tree.insert("", "end", text=nombre,
+                             values=(datos['conteo'], f"{datos['por_segundo']:.1f}",
+                                     f"{datos['p50_ms']:.2f}", f"{datos['p95_ms']:.2f}",
+                                     f"{datos['p99_ms']:.2f}"))
+        for nombre, datos in resumen['contadores'].items():
+            self.tree.insert("", "end", text=nombre,
+                             values=(datos['total'], f"{datos['por_segundo']:.1f}", "", "", ""))
+        cache = self.controller.cache_consultas.estadisticas()
+        self.estado_label.configure(
+            text=f"Últimos {int(resumen['transcurrido_s'])} s  "
+                 f"Pendientes de escritura: {self.controller.escritor_registros.pendientes()}  "
+                 f"Caché de consultas: {cache['tasa_aciertos']:.0%} aciertos, "
+                 f"{cache['consultas']} guardadas ({cache['memoria'] / 1024:.0f} KB)")
+
+        self.tarea_actualizar = self.after(1000, self.actualizar)
+
+    def guardar_metricas(self):
+        try:
+            METRICAS.volcar()
+        except OSError as e:
+            messagebox.showerror("Error", f"Error al guardar métricas: {e}")
+            return
+        messagebox.showinfo("Éxito", f"Métricas guardadas en {RUTA_METRICAS}.json y {RUTA_METRICAS}.prom")
+
+    def reiniciar(self):
+        METRICAS.reiniciar()
+        self.tree.delete(*self.tree.get_children())
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+def benchmark_indice(alumnos=50000, busquedas=100000):
+    """Mide construcción, memoria y latencia de búsqueda del índice de credenciales"""
+    indice = IndiceCredenciales()
+    combinaciones = [(n, g, grupo) for n, grados in GRADOS.items()
+                     for g in grados for grupo in "ABCDE"]
+
+    inicio = time.perf_counter()
+    codigos = []
+    for i in range(alumnos):
+        nivel, grado, grupo = combinaciones[i % len(combinaciones)]
+        codigo = f"{nivel}_{grado}_{i:08d}"
+        codigos.append(codigo)
+        indice.agregar(i + 1, (f"{i:08d}", f"Alumno {i}", 10, nivel, grado, grupo, codigo))
+    construccion = time.perf_counter() - inicio
+
+    muestras = []
+    for _ in range(busquedas):
+        codigo = random.choice(codigos)
+        t0 = time.perf_counter_ns()
+        indice.buscar(codigo)
+        muestras.append(time.perf_counter_ns() - t0)
+
+    print(f"Alumnos: {len(indice)}")
+    print(f"Construcción: {construccion * 1000:.1f} ms")
+    print(f"Memoria: {indice.tamano_memoria() / (1024 * 1024):.2f} MB")
+    print(f"Búsqueda p50: {percentil(muestras, 50)} ns  "
+          f"p99: {percentil(muestras, 99)} ns")
+
+def benchmark_migraciones(ruta=":memory:"):
+    """Compara el arranque en frío (esquema nuevo) con el arranque en caliente"""
+    conexion = sqlite3.connect(ruta)
+
+    inicio = time.perf_counter()
+    tiempos = migrar_base_datos(conexion)
+    frio = time.perf_counter() - inicio
+    for numero, segundos in tiempos:
+        print(f"Migración {numero}: {segundos * 1000:.2f} ms")
+
+    inicio = time.perf_counter()
+    migrar_base_datos(conexion)
+    caliente = time.perf_counter() - inicio
+
+    print(f"Arranque en frío: {frio * 1000:.2f} ms")
+    print(f"Arranque en caliente: {caliente * 1000:.3f} ms")
+    conexion.close()
+
+def benchmark_sqlite(filas=20000, consultas=5000, lote=100):
+    """Compara escrituras y consultas por segundo entre los perfiles de SQLite"""
+    import tempfile
+
+    print(f"{'Perfil':<12}{'Inserciones/s':>16}{'Consultas/s':>14}")
+    for perfil in PERFILES_SQLITE:
+        with tempfile.TemporaryDirectory() as directorio:
+            bd = GestorConexiones(os.path.join(directorio, "benchmark.db"), perfil)
+            escritura = bd.escritura()
+            migrar_base_datos(escritura)
+
+            inicio = time.perf_counter()
+            for base in range(0, filas, lote):
+                with escritura:
+                    escritura.executemany('''
+                        INSERT INTO registro_entrada_salida (alumno_id, fecha_hora, tipo)
+                        VALUES (?, ?, ?)
+                    ''', [(i % 1000, datetime.now(), 'entrada')
+                          for i in range(base, min(base + lote, filas))])
+            inserciones = filas / (time.perf_counter() - inicio)
+
+            lectura = bd.lectura()
+            inicio = time.perf_counter()
+            for _ in range(consultas):
+                lectura.execute('''
+                    SELECT COUNT(*) FROM registro_entrada_salida WHERE alumno_id = ?
+                ''', (random.randrange(1000),)).fetchone()
+            por_segundo = consultas / (time.perf_counter() - inicio)
+
+            bd.cerrar()
+        print(f"{perfil:<12}{inserciones:>16.0f}{por_segundo:>14.0f}")
+
+def importar_desde_cli(ruta, carpeta_fotos=None, tamano_lote=TAMANO_LOTE_IMPORTACION, procesos=None):
+    bd = GestorConexiones(RUTA_BASE_DATOS)
+    conexion = bd.escritura()
+    migrar_base_datos(conexion)
+
+    def progreso(procesadas, insertados, errores):
+        print(f"Filas: {procesadas}  Guardadas: {insertados}  Errores: {errores}", file=sys.stderr)
+
+    importador = ImportadorAlumnos(conexion, carpeta_fotos=carpeta_fotos, tamano_lote=tamano_lote,
+                                   procesos=procesos, progreso=progreso)
+    insertados, errores = importador.importar(ruta)
+    bd.cerrar()
+
+    for fila, mensaje in errores:
+        print(f"Fila {fila}: {mensaje}")
+    print(f"Alumnos importados: {insertados}  Filas con error: {len(errores)}")
+
+def exportar_desde_cli(salida, conjunto='alumnos', formato=None, nivel="", grado="", grupo="",
+                       desde="", hasta="", fotos='referencia', carpeta_fotos=None,
+                       tamano_bloque=TAMANO_BLOQUE_EXPORTACION):
+    bd = GestorConexiones(RUTA_BASE_DATOS)
+    migrar_base_datos(bd.escritura())
+    resultado = []
+
+    def progreso(exportadas, total):
+        print(f"Filas: {exportadas} de {total}", file=sys.stderr)
+
+    cancelado = threading.Event()
+    listo = threading.Event()
+
+    def ejecutar():
+        # La conexión de lectura pertenece al hilo que exporta
+        conexion = bd.nueva_lectura()
+        try:
+            exportador = ExportadorDatos(conexion, conjunto, nivel, grado, grupo, desde, hasta,
+                                         fotos, carpeta_fotos, tamano_bloque, progreso, cancelado)
+            resultado.append(exportador.exportar(salida, formato))
+        except Exception as e:
+            resultado.append(e)
+        finally:
+            bd.cerrar_conexion(conexion)
+            listo.set()
+
+    threading.Thread(target=ejecutar, daemon=True).start()
+    try:
+        while not listo.wait(0.2):
+            pass
+    except KeyboardInterrupt:
+        # Ctrl+C cancela sin dejar un archivo a medias
+        cancelado.set()
+        listo.wait()
+    bd.cerrar()
+
+    exportadas = resultado[0] if resultado else None
+    if isinstance(exportadas, Exception):
+        print(f"Error al exportar: {exportadas}", file=sys.stderr)
+    elif exportadas is None:
+        print("Exportación cancelada", file=sys.stderr)
+    else:
+        print(f"Filas exportadas: {exportadas} en {salida}")
+
+def verificar_ocupacion_desde_cli():
+    bd = GestorConexiones(RUTA_BASE_DATOS)
+    conexion = bd.escritura()
+    migrar_base_datos(conexion)
+    diferencias = reconstruir_ocupacion(conexion)
+    bd.cerrar()
+
+    for (nivel, grado, grupo), guardado, real in sorted(diferencias):
+        print(f"{nivel} {grado} {grupo}: contador {guardado}, real {real}")
+    print(f"Grupos corregidos: {len(diferencias)}")
+
+def asistencia_desde_cli(fecha=None, reconstruir=False, nivel="", grado="", grupo=""):
+    bd = GestorConexiones(RUTA_BASE_DATOS)
+    conexion = bd.escritura()
+    migrar_base_datos(conexion)
+    inicio = time.perf_counter()
+    incorporados = reconstruir_resumenes(conexion) if reconstruir else actualizar_resumenes(conexion)
+    print(f"Eventos incorporados: {incorporados} en {time.perf_counter() - inicio:.2f} s")
+
+    fecha = fecha or datetime.now().date().isoformat()
+    print(f"Presencia del {fecha}:")
+    for nivel_grupo, grado_grupo, nombre_grupo, presentes, inscritos in presencia_por_grupo(conexion, fecha):
+        print(f"  {nivel_grupo} {grado_grupo} {nombre_grupo}: {presentes} de {inscritos}")
+
+    # Con algún filtro se lista además a cada alumno que asistió
+    if nivel or grado or grupo:
+        print("Alumnos:")
+        for matricula, nombre, entrada, salida, segundos in asistencia_del_dia(conexion, fecha, nivel,
+                                                                                grado, grupo):
+            horas, minutos = divmod((segundos or 0) // 60, 60)
+            # Las marcas son del mismo día: basta la hora
+            entrada = str(entrada)[11:19] if entrada else "-"
+            salida = str(salida)[11:19] if salida else "-"
+            print(f"  {matricula}  {nombre}: entrada {entrada}  salida {salida}  "
+                  f"en plantel {horas}:{minutos:02d}")
+    bd.cerrar()
+
+NOMBRES = ["José", "María", "Sofía", "Ángel", "Iván", "Lucía", "Andrés", "Valentina",
+           "Jesús", "Ximena", "Héctor", "Renata", "Julián", "Mónica", "Raúl", "Inés"]
+APELLIDOS = ["Hernández", "García", "Martínez", "López", "González", "Pérez", "Rodríguez",
+             "Sánchez", "Ramírez", "Núñez", "Gómez", "Díaz", "Jiménez", "Ruíz", "Vázquez", "Muñoz"]
+
+def nombre_aleatorio(generador=random):
+    return (f"{generador.choice(NOMBRES)} {generador.choice(APELLIDOS)} "
+            f"{generador.choice(APELLIDOS)}")
+
+def benchmark_busqueda(alumnos=100000, consultas=200):
+    """Compara la búsqueda por prefijo con FTS5 contra el LIKE '%...%' original"""
+    conexion = sqlite3.connect(":memory:")
+    migrar_base_datos(conexion)
+    # Sin límite de grupo para poder cargar muchos alumnos en pocos grupos
+    conexion.execute("DROP TRIGGER check_grupo_limite")
+    generador = random.Random(0)
+    with conexion:
+        conexion.executemany('''
+            INSERT INTO alumnos (matricula, nombre, edad, nivel, grado, grupo, codigo_barras)
+            VALUES (?, ?, 10, 'Primaria', '1er año', 'A', ?)
+        ''', ((f"{i:08d}", nombre_aleatorio(generador), f"codigo_{i}") for i in range(alumnos)))
+
+    # Nombre y apellido a medio escribir, como en el buscador
+    textos = []
+    for _ in range(consultas):
+        nombre, apellido = nombre_aleatorio(generador).split()[:2]
+        textos.append(f"{nombre[:generador.randint(3, 5)]} {apellido[:generador.randint(2, 5)]}")
+
+    def buscar_like(texto):
+        # Misma consulta que FTS5: todas las palabras requeridas, cada una con su propio LIKE
+        palabras = re.findall(r"\w+", texto)
+        return conexion.execute(f'''
+            SELECT id, matricula, nombre, edad, grupo, fecha_registro FROM alumnos
+            WHERE {" AND ".join("nombre LIKE ?" for _ in palabras)}
+            ORDER BY nombre LIMIT ?
+        ''', [f"%{palabra}%" for palabra in palabras] + [MAX_RESULTADOS_BUSQUEDA]).fetchall()
+
+    def medir(funcion):
+        muestras = []
+        encontradas = []
+        for texto in textos:
+            inicio = time.perf_counter()
+            encontradas.append(funcion(texto))
+            muestras.append((time.perf_counter() - inicio) * 1000)
+        return percentil(muestras, 50), percentil(muestras, 95), encontradas
+
+    fts = medir(lambda t: ConsultaPaginada(conexion, texto=t).total())
+    like = medir(lambda t: len(buscar_like(t)))
+
+    # Los conteos no son idénticos: LIKE busca subcadenas del nombre; FTS5, prefijos de palabra
+    # en nombre y matrícula sin distinguir acentos. Ambos están topados en MAX_RESULTADOS_BUSQUEDA
+    print(f"Alumnos: {alumnos}  Consultas: {consultas}")
+    for nombre, (p50, p95, encontradas) in (("FTS5", fts), ("LIKE", like)):
+        print(f"{nombre:<6}p50: {p50:.2f} ms  p95: {p95:.2f} ms  "
+              f"con resultados: {sum(1 for n in encontradas if n)}  "
+              f"filas (hasta {MAX_RESULTADOS_BUSQUEDA} por consulta): {sum(encontradas)}")
+    conexion.close()
+
+def benchmark_consultas(alumnos=50000, consultas=2000, combinaciones=6, altas_cada=50):
+    """Alterna entre pocas combinaciones de filtros, con y sin caché, intercalando altas"""
+    conexion = sqlite3.connect(":memory:", cached_statements=SENTENCIAS_EN_CACHE)
+    migrar_base_datos(conexion)
+    conexion.execute("DROP TRIGGER check_grupo_limite")
+    generador = random.Random(0)
+    grupos = [(nivel, grado, grupo) for nivel, grados in GRADOS.items() for grado in grados for grupo in GRUPOS]
+    with conexion:
+        conexion.executemany('''
+            INSERT INTO alumnos (matricula, nombre, edad, nivel, grado, grupo, codigo_barras)
+            VALUES (?, ?, 10, ?, ?, ?, ?)
+        ''', ((f"{i:08d}", nombre_aleatorio(generador)) + grupos[i % len(grupos)] + (f"codigo_{i}",)
+              for i in range(alumnos)))
+
+    # Pocas combinaciones visitadas una y otra vez, como en el uso diario
+    vistas = generador.sample(grupos, combinaciones)
+    secuencia = [generador.choice(vistas) for _ in range(consultas)]
+    altas = [generador.choice(grupos) for _ in range(consultas // altas_cada + 1)]
+
+    numeros = itertools.count(alumnos)
+
+    def medir(cache):
+        muestras = []
+        for numero, (nivel, grado, grupo) in enumerate(secuencia):
+            if numero and numero % altas_cada == 0:
+                alta = altas[numero // altas_cada]
+                siguiente = next(numeros)
+                with conexion:
+                    conexion.execute('''
+                        INSERT INTO alumnos (matricula, nombre, edad, nivel, grado, grupo, codigo_barras)
+                        VALUES (?, ?, 10, ?, ?, ?, ?)
+                    ''', (f"{siguiente:08d}", nombre_aleatorio(generador)) + alta + (f"codigo_{siguiente}",))
+                if cache is not None:
+                    cache.invalidar(*alta)
+            inicio = time.perf_counter()
+            abrir_consulta(conexion, nivel, grado, grupo, "", FILAS_VISIBLES_CONSULTA, cache)
+            muestras.append((time.perf_counter() - inicio) * 1000)
+        return percentil(muestras, 50), percentil(muestras, 95)
+
+    sin_cache = medir(None)
+    cache = CacheConsultas()
+    con_cache = medir(cache)
+    stats = cache.estadisticas()
+
+    print(f"Alumnos: {alumnos}  Consultas: {consultas}  Combinaciones: {combinaciones}  "
+          f"Alta cada {altas_cada} consultas")
+    print(f"Sin caché  p50: {sin_cache[0]:.3f} ms  p95: {sin_cache[1]:.3f} ms")
+    print(f"Con caché  p50: {con_cache[0]:.3f} ms  p95: {con_cache[1]:.3f} ms  "
+          f"aciertos: {stats['tasa_aciertos']:.1%} ({stats['aciertos']}/{stats['aciertos'] + stats['fallos']})  "
+          f"invalidadas: {stats['invalidadas']}  memoria: {stats['memoria'] / 1024:.0f} KB")
+    conexion.close()
+
+# Datos sintéticos y prueba de carga
+FOTOS_SINTETICAS_DISTINTAS = 16     # Imágenes base; cada alumno recibe una variante con hash propio
+PROBABILIDAD_AUSENCIA = 0.07
+TOLERANCIA_REGRESION = 0.25         # Empeoramiento permitido frente a la referencia
+MARGEN_REGRESION_MS = 0.05          # Diferencias de latencia menores se consideran ruido
+
+def _foto_sintetica(semilla, lado=LADO_MAXIMO_FOTO):
+    """Retrato sintético con textura, del tamaño y peso de una foto ya procesada"""
+    generador = random.Random(semilla)
+    ancho, alto = lado * 3 // 4, lado
+
+    def color(minimo=0, maximo=255):
+        return tuple(generador.randint(minimo, maximo) for _ in range(3))
+
+    textura = Image.effect_noise((ancho // 8, alto // 8), 60).resize((ancho, alto), Image.BICUBIC)
+    imagen = Image.blend(Image.new('RGB', (ancho, alto), color(120, 220)),
+                         Image.merge('RGB', (textura,) * 3), 0.35)
+    dibujo = ImageDraw.Draw(imagen)
+    dibujo.ellipse((ancho * 0.25, alto * 0.15, ancho * 0.75, alto * 0.6), fill=color(110, 230))
+    dibujo.rectangle((ancho * 0.1, alto * 0.65, ancho * 0.9, alto), fill=color())
+    # Grano fino: sin él el JPEG resulta mucho más liviano que una foto real
+    grano = Image.effect_noise((ancho, alto), 12)
+    imagen = Image.blend(imagen, Image.merge('RGB', (grano,) * 3), 0.15)
+
+    salida = io.BytesIO()
+    imagen.save(salida, format=FORMATO_FOTO, quality=CALIDAD_FOTO)
+    return salida.getvalue()
+
+def _foto_unica(base, marca):
+    """Agrega un comentario JPEG con la marca: mismo peso, pero un hash distinto en el almacén"""
+    if base[:2] != b'\xff\xd8':
+        return base
+    comentario = marca.encode('utf-8')
+    return base[:2] + b'\xff\xfe' + (len(comentario) + 2).to_bytes(2, 'big') + comentario + base[2:]
+
+def _edad_sintetica(nivel, grado, generador):
+    inicial = {"Preescolar": 3, "Primaria": 6, "Secundaria": 12}[nivel]
+    return inicial + GRADOS[nivel].index(grado) + generador.randint(0, 1)
+
+def dias_habiles(dias, hasta=None):
+    """Los últimos `dias` días de lunes a viernes hasta la fecha dada, del más antiguo al más reciente"""
+    fecha = (hasta or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    resultado = []
+    while len(resultado) < dias:
+        if fecha.weekday() < 5:
+            resultado.append(fecha)
+        fecha -= timedelta(days=1)
+    return resultado[::-1]
+
+def generar_datos_sinteticos(conexion, alumnos=2000, dias=20, semilla=0, con_fotos=True,
+                             reservar=0, progreso=None):
+    """Agrega alumnos repartidos en todos los grupos y sus entradas y salidas de `dias` días hábiles.
+
+    Respeta el límite por grupo (dejando `reservar` lugares libres en cada uno) y devuelve
+    (alumnos insertados, eventos insertados).
+    """
+    generador = random.Random(semilla)
+    grupos = [(nivel, grado, grupo) for nivel, grados in GRADOS.items() for grado in grados for grupo in GRUPOS]
+    libres = {grupo: LIMITE_GRUPO - reservar - ocupacion_grupo(conexion, *grupo) for grupo in grupos}
+    capacidad = sum(max(0, lugares) for lugares in libres.values())
+    if alumnos > capacidad:
+        print(f"Solo caben {capacidad} alumnos más con el límite de {LIMITE_GRUPO} por grupo",
+              file=sys.stderr)
+        alumnos = capacidad
+
+    fotos_base = []
+    if con_fotos and alumnos:
+        with ProcessPoolExecutor() as ejecutor:
+            fotos_base = list(ejecutor.map(_foto_sintetica,
+                                           (semilla * 1000 + i for i in range(FOTOS_SINTETICAS_DISTINTAS))))
+
+    # Repartir en orden circular para que todos los grupos crezcan parejo
+    disponibles = itertools.cycle(grupos)
+    primero = conexion.execute('SELECT COALESCE(MAX(id), 0) FROM alumnos').fetchone()[0] + 1
+    almacen = AlmacenFotos(conexion)
+    for inicio in range(0, alumnos, TAMANO_LOTE_IMPORTACION):
+        with conexion:
+            filas = []
+            for numero in range(primero + inicio, primero + min(alumnos, inicio + TAMANO_LOTE_IMPORTACION)):
+                nivel, grado, grupo = next(g for g in disponibles if libres[g] > 0)
+                libres[(nivel, grado, grupo)] -= 1
+                matricula = f"S{numero:07d}"
+                foto_hash = None
+                if fotos_base:
+                    foto_hash = almacen.guardar(_foto_unica(generador.choice(fotos_base), matricula))
+                filas.append((matricula, nombre_aleatorio(generador), _edad_sintetica(nivel, grado, generador),
+                              nivel, grado, grupo, f"{nivel}_{grado}_{matricula}", foto_hash, datetime.now()))
+            conexion.executemany('''
+                INSERT INTO alumnos
+                (matricula, nombre, edad, nivel, grado, grupo, codigo_barras, foto_hash, fecha_registro)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', filas)
+        if progreso:
+            progreso('alumnos', min(alumnos, inicio + TAMANO_LOTE_IMPORTACION), alumnos)
+
+    # Entradas por la mañana y salidas por la tarde, en orden de llegada
+    ids = [fila[0] for fila in conexion.execute('SELECT id FROM alumnos')]
+    eventos = 0
+    fechas = dias_habiles(dias)
+    for numero, dia in enumerate(fechas, start=1):
+        lote = []
+        for alumno_id in ids:
+            if generador.random() < PROBABILIDAD_AUSENCIA:
+                continue
+            entrada = dia + timedelta(hours=7, minutes=max(0.0, generador.gauss(35, 12)))
+            salida = dia + timedelta(hours=14, minutes=generador.gauss(0, 25))
+            lote.append((alumno_id, entrada, 'entrada'))
+            lote.append((alumno_id, salida, 'salida'))
+        lote.sort(key=lambda evento: evento[1])
+        with conexion:
+            conexion.executemany('''
+                INSERT INTO registro_entrada_salida (alumno_id, fecha_hora, tipo) VALUES (?, ?, ?)
+            ''', lote)
+        eventos += len(lote)
+        if progreso:
+            progreso('días', numero, len(fechas))
+
+    actualizar_resumenes(conexion)
+    return alumnos, eventos
+
+def generar_datos_desde_cli(ruta, alumnos, dias, semilla=0, con_fotos=True):
+    bd = GestorConexiones(ruta)
+    conexion = bd.escritura()
+    migrar_base_datos(conexion)
+
+    def progreso(etapa, hechos, total):
+        print(f"{etapa}: {hechos} de {total}", file=sys.stderr)
+
+    inicio = time.perf_counter()
+    insertados, eventos = generar_datos_sinteticos(conexion, alumnos, dias, semilla, con_fotos,
+                                                   progreso=progreso)
+    bd.cerrar()
+    print(f"Alumnos: {insertados}  Eventos: {eventos}  en {time.perf_counter() - inicio:.1f} s ({ruta})")
+
+def prueba_carga(alumnos=2000, dias=20, registros=100, escaneos=5000, consultas=1000, semilla=0,
+                 con_fotos=True, ruta=None):
+    """Ejecuta sin interfaz las rutas de registro, escaneo y consulta sobre datos sintéticos.
+
+    Devuelve {ruta: {operaciones, por_segundo, p50_ms, p95_ms, p99_ms}}.
+    """
+    argumentos = (alumnos, dias, registros, escaneos, consultas, semilla, con_fotos)
+    if ruta is not None:
+        return _ejecutar_prueba_carga(ruta, *argumentos)
+    # La base temporal se borra aunque la prueba falle a la mitad
+    with tempfile.TemporaryDirectory(prefix="prueba_carga_") as carpeta:
+        return _ejecutar_prueba_carga(os.path.join(carpeta, "registro.db"), *argumentos)
+
+def _ejecutar_prueba_carga(ruta, alumnos, dias, registros, escaneos, consultas, semilla, con_fotos):
+    bd = GestorConexiones(ruta)
+    try:
+        medidas, duraciones, cache = _fases_prueba_carga(bd, alumnos, dias, registros, escaneos,
+                                                        consultas, semilla, con_fotos)
+    finally:
+        bd.cerrar()
+
+    tiempos = medidas.resumen()['tiempos']
+    resultados = {}
+    for nombre, (operaciones, segundos) in duraciones.items():
+        resultados[nombre] = dict(tiempos.get(nombre, {}), operaciones=operaciones,
+                                  por_segundo=operaciones / segundos if segundos else 0.0)
+        resultados[nombre].pop('conteo', None)
+        resultados[nombre].pop('suma_ms', None)
+    for nombre in ('escaneo.vaciado', 'consulta.desplazamiento'):
+        if nombre in tiempos:
+            resultados[nombre] = dict(tiempos[nombre], operaciones=tiempos[nombre].pop('conteo'))
+            resultados[nombre].pop('por_segundo', None)
+            resultados[nombre].pop('suma_ms', None)
+    resultados['consulta']['aciertos_cache'] = cache.estadisticas()['tasa_aciertos']
+    return resultados
+
+def _fases_prueba_carga(bd, alumnos, dias, registros, escaneos, consultas, semilla, con_fotos):
+    conexion = bd.escritura()
+    migrar_base_datos(conexion)
+    generador = random.Random(semilla + 1)
+    medidas = Metricas(activas=True)
+    duraciones = {}
+
+    def fase(nombre, operaciones, funcion):
+        inicio = time.perf_counter()
+        funcion()
+        duraciones[nombre] = (operaciones, time.perf_counter() - inicio)
+
+    # Datos base: cada grupo conserva lugares libres para la fase de registro
+    grupos = [(nivel, grado, grupo) for nivel, grados in GRADOS.items() for grado in grados for grupo in GRUPOS]
+    reservar = min(LIMITE_GRUPO, -(-registros // len(grupos)))
+    generados = []
+    fase('generacion', 1, lambda: generados.extend(
+        generar_datos_sinteticos(conexion, alumnos, dias, semilla, con_fotos, reservar)))
+    duraciones['generacion'] = (generados[0], duraciones['generacion'][1])
+
+    indice = IndiceCredenciales()
+    indice.cargar(conexion)
+    foto_base = _foto_sintetica(semilla) if con_fotos else None
+
+    # Registro: validación de cupo y matrícula, almacén de fotos e inserción, como en la interfaz
+    def registrar():
+        for numero in range(registros):
+            nivel, grado, grupo = grupos[numero % len(grupos)]
+            matricula = f"R{numero:07d}"
+            datos = (matricula, nombre_aleatorio(generador), _edad_sintetica(nivel, grado, generador),
+                     nivel, grado, grupo, f"{nivel}_{grado}_{matricula}",
+                     _foto_unica(foto_base, matricula) if foto_base else None, datetime.now())
+            with medidas.medir('registro'):
+                alumno_id = insertar_alumno(conexion, datos)
+            indice.agregar(alumno_id, datos)
+
+    fase('registro', registros, registrar)
+
+    # Escaneo: antirrebote, índice en memoria y escritor por lotes, como procesar_codigo
+    codigos = [fila[0] for fila in conexion.execute('SELECT codigo_barras FROM alumnos')]
+    secuencia = []
+    for _ in range(escaneos):
+        azar = generador.random()
+        if azar < 0.02 or not codigos:
+            secuencia.append(f"desconocido_{generador.randint(0, 10**6)}")
+        elif azar < 0.15 and secuencia:
+            secuencia.append(secuencia[-1])      # La misma credencial frente a la cámara
+        else:
+            secuencia.append(generador.choice(codigos))
+
+    filtro = FiltroDuplicados()
+    previas = conexion.execute('SELECT COUNT(*) FROM registro_entrada_salida').fetchone()[0]
+    escritor = EscritorRegistros(bd)
+    escritor.iniciar()
+
+    aceptadas = []
+
+    def escanear():
+        for codigo in secuencia:
+            with medidas.medir('escaneo'):
+                if registrar_lectura(codigo, filtro, indice, escritor) is not None:
+                    aceptadas.append(codigo)
+        # Incluye el volcado de los eventos pendientes y la actualización de resúmenes
+        with medidas.medir('escaneo.vaciado'):
+            escritor.cerrar()
+
+    try:
+        fase('escaneo', escaneos, escanear)
+    except BaseException:
+        escritor.cerrar()
+        raise
+
+    # Cada lectura aceptada debe haber llegado a la base, sin importar el tablero
+    guardadas = conexion.execute('SELECT COUNT(*) FROM registro_entrada_salida').fetchone()[0] - previas
+    if guardadas != len(aceptadas):
+        raise RuntimeError(f"Se aceptaron {len(aceptadas)} lecturas pero se guardaron {guardadas} registros")
+
+    # Consulta: pocas combinaciones de filtros visitadas a menudo, búsquedas por nombre y desplazamiento
+    lectura = bd.lectura()
+    cache = CacheConsultas()
+    vistas = generador.sample(grupos, min(8, len(grupos)))
+
+    def consultar():
+        for _ in range(consultas):
+            if generador.random() < 0.7:
+                nivel, grado, grupo = generador.choice(vistas)
+                if generador.random() < 0.3:
+                    grado, grupo = "", ""
+                texto = ""
+            else:
+                nivel, grado, grupo = "", "", ""
+                texto = " ".join(palabra[:generador.randint(3, 5)]
+                                 for palabra in nombre_aleatorio(generador).split()[:2])
+            with medidas.medir('consulta'):
+                consulta, total, _ = abrir_consulta(lectura, nivel, grado, grupo, texto,
+                                                    FILAS_VISIBLES_CONSULTA, cache)
+            if total > FILAS_VISIBLES_CONSULTA:
+                with medidas.medir('consulta.desplazamiento'):
+                    consulta.filas(generador.randint(0, total - FILAS_VISIBLES_CONSULTA), FILAS_VISIBLES_CONSULTA)
+                    cache.actualizar(consulta)
+
+    fase('consulta', consultas, consultar)
+    return medidas, duraciones, cache
+
+def comparar_con_referencia(resultados, referencia, tolerancia=TOLERANCIA_REGRESION):
+    """Devuelve las regresiones: p95 más lento o ritmo más bajo que la referencia más la tolerancia"""
+    regresiones = []
+    for nombre, actual in resultados.items():
+        anterior = referencia.get(nombre)
+        if not anterior:
+            continue
+        if 'p95_ms' in actual and 'p95_ms' in anterior \
+                and actual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia) \
+                and actual['p95_ms'] - anterior['p95_ms'] > MARGEN_REGRESION_MS:
+            regresiones.append(f"{nombre}: p95 {actual['p95_ms']:.3f} ms (referencia {anterior['p95_ms']:.3f} ms)")
+        if 'por_segundo' in actual and 'por_segundo' in anterior \
+                and actual['por_segundo'] < anterior['por_segundo'] * (1 - tolerancia):
+            regresiones.append(f"{nombre}: {actual['por_segundo']:.1f}/s (referencia {anterior['por_segundo']:.1f}/s)")
+    return regresiones
+
+def prueba_carga_desde_cli(alumnos, dias, registros, escaneos, consultas, semilla=0, con_fotos=True,
+                           ruta=None, salida=None, referencia=None, tolerancia=TOLERANCIA_REGRESION):
+    """Imprime el reporte; devuelve 1 si hay regresiones frente a la referencia"""
+    resultados = prueba_carga(alumnos, dias, registros, escaneos, consultas, semilla, con_fotos, ruta)
+
+    print(f"Alumnos: {alumnos}  Días: {dias}  Registros: {registros}  Escaneos: {escaneos}  "
+          f"Consultas: {consultas}  Fotos: {'sí' if con_fotos else 'no'}")
+    for nombre, datos in resultados.items():
+        linea = f"{nombre:<24} {datos['operaciones']:>7}"
+        if 'por_segundo' in datos:
+            linea += f"  {datos['por_segundo']:>10.1f}/s"
+        if 'p50_ms' in datos:
+            linea += (f"  p50 {datos['p50_ms']:.3f} ms  p95 {datos['p95_ms']:.3f} ms"
+                      f"  p99 {datos['p99_ms']:.3f} ms")
+        if 'aciertos_cache' in datos:
+            linea += f"  caché {datos['aciertos_cache']:.0%}"
+        print(linea)
+
+    if salida:
+        with open(salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=2)
+
+    if referencia:
+        with open(referencia, encoding='utf-8') as archivo:
+            regresiones = comparar_con_referencia(resultados, json.load(archivo), tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}")
+        if regresiones:
+            return 1
+        print(f"Sin regresiones frente a {referencia} (tolerancia {tolerancia:.0%})")
+    return 0
+
+PRESUPUESTO_ARRANQUE_MS = 1500
+
+def medir_arranque():
+    """Se ejecuta en un proceso hijo: imprime los segundos hasta que el login está dibujado"""
+    root = tk.Tk()
+    app = SistemaRegistroEscolar(root)
+    root.update()
+    listo = time.time()
+    cargados = [m for m in ("cv2", "pyzbar", "qrcode") if m in sys.modules]
+    print(listo, ",".join(cargados))
+    app.salir()
+
+def benchmark_arranque(repeticiones=5, presupuesto_ms=PRESUPUESTO_ARRANQUE_MS):
+    """Tiempo hasta la pantalla de login interactiva; falla si supera el presupuesto"""
+    import subprocess
+    import tempfile
+
+    tiempos = []
+    with tempfile.TemporaryDirectory() as directorio:
+        for _ in range(repeticiones):
+            inicio = time.time()
+            # Cada arranque en un proceso nuevo, contra una base de datos desechable
+            salida = subprocess.run([sys.executable, os.path.abspath(__file__), "medir-arranque"],
+                                    cwd=directorio, capture_output=True, text=True, check=True)
+            listo, cargados = (salida.stdout.strip().split(" ") + [""])[:2]
+            tiempos.append((float(listo) - inicio) * 1000)
+
+    mediana = percentil(tiempos, 50)
+    print(f"Arranque hasta login: mediana {mediana:.0f} ms, máximo {max(tiempos):.0f} ms")
+    if cargados:
+        print(f"Módulos pesados cargados al arranque: {cargados}")
+    if mediana > presupuesto_ms:
+        print(f"Excede el presupuesto de {presupuesto_ms} ms")
+        sys.exit(1)
+
+def credenciales_desde_cli(salida, nivel, grado="", grupo="", procesos=None):
+    bd = GestorConexiones(RUTA_BASE_DATOS)
+    migrar_base_datos(bd.escritura())
+
+    def progreso(hojas, alumnos):
+        print(f"Hojas: {hojas}  Credenciales: {alumnos}", file=sys.stderr)
+
+    inicio = time.perf_counter()
+    hojas = GeneradorCredenciales(procesos).exportar(
+        alumnos_para_credenciales(bd.lectura(), nivel, grado, grupo), salida, progreso)
+    bd.cerrar()
+    print(f"Hojas generadas: {hojas} en {time.perf_counter() - inicio:.1f} s")
+
+def frames_sinteticos(cantidad, tamano, semilla=0):
+    """Genera (frame, datos) con un QR en posición, escala y nitidez aleatorias"""
+    import cv2
+    import numpy as np
+
+    generador = random.Random(semilla)
+    ancho, alto = tamano
+    for i in range(cantidad):
+        datos = f"{generador.choice(list(GRADOS))}_1er año_{i:06d}"
+        qr = np.array(Image.open(io.BytesIO(_renderizar_qr(datos))).convert('L'))
+        lado = generador.randint(min(ancho, alto) // 4, min(ancho, alto) * 3 // 4)
+        qr = cv2.resize(qr, (lado, lado), interpolation=cv2.INTER_AREA)
+
+        ruido = np.random.default_rng(semilla + i).integers(90, 200, (alto, ancho), dtype=np.uint8)
+        x = generador.randint(0, ancho - lado)
+        y = generador.randint(0, alto - lado)
+        ruido[y:y + lado, x:x + lado] = qr
+        if generador.random() < 0.3:
+            ruido = cv2.GaussianBlur(ruido, (5, 5), 0)
+        yield cv2.cvtColor(ruido, cv2.COLOR_GRAY2BGR), datos
+
+def frames_de_video(ruta, tamano, limite):
+    """Frames de una grabación; sin datos esperados, un frame sin lecturas cuenta como fallo"""
+    import cv2
+    captura = cv2.VideoCapture(ruta)
+    try:
+        for _ in range(limite):
+            ret, frame = captura.read()
+            if not ret:
+                break
+            yield cv2.resize(frame, tamano), None
+    finally:
+        captura.release()
+
+def benchmark_decodificacion(decodificadores=tuple(DECODIFICADORES), resoluciones=((480, 360),),
+                             frames=100, video=None):
+    """Decodificaciones por segundo, latencia y tasa de fallos por decodificador y resolución"""
+    print(f"{'Decodificador':<14}{'Resolución':>11}{'Frames/s':>10}{'p50 ms':>9}"
+          f"{'p95 ms':>9}{'p99 ms':>9}{'Fallos':>9}")
+    for tamano in resoluciones:
+        if video:
+            muestras = list(frames_de_video(video, tamano, frames))
+        else:
+            muestras = list(frames_sinteticos(frames, tamano))
+        if not muestras:
+            print(f"Sin frames para {tamano[0]}x{tamano[1]}")
+            continue
+
+        for nombre in decodificadores:
+            try:
+                decodificador = crear_decodificador(nombre)
+            except ImportError as e:
+                print(f"{nombre:<14}no disponible: {e}")
+                continue
+
+            latencias = []
+            fallos = 0
+            for frame, esperado in muestras:
+                inicio = time.perf_counter()
+                leidos = [d.datos for d in decodificador.detectar(frame)]
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                if (esperado not in leidos) if esperado is not None else not leidos:
+                    fallos += 1
+
+            resolucion = f"{tamano[0]}x{tamano[1]}"
+            print(f"{nombre:<14}{resolucion:>11}{len(muestras) / (sum(latencias) / 1000):>10.1f}"
+                  f"{percentil(latencias, 50):>9.2f}{percentil(latencias, 95):>9.2f}"
+                  f"{percentil(latencias, 99):>9.2f}{fallos / len(muestras):>9.1%}")
+
+def benchmark_vista_previa(frames=3000):
+    """Compara el renderizado original (RGBA + PhotoImage nuevo) con el renderizador reutilizable"""
+    import cv2
+    import numpy as np
+    import tracemalloc
+
+    try:
+        root = tk.Tk()
+        root.withdraw()
+        label = tk.Label(root)
+    except tk.TclError:
+        # Sin pantalla solo se mide la conversión, sin PhotoImage
+        root = None
+        label = None
+
+    muestras = [np.random.default_rng(i).integers(0, 255, (TAMANO_VIDEO[1], TAMANO_VIDEO[0], 3),
+                                                  dtype=np.uint8) for i in range(8)]
+
+    def original(frame):
+        imagen = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA))
+        if label is not None:
+            label.imgtk = ImageTk.PhotoImage(image=imagen)
+            label.configure(image=label.imgtk)
+
+    renderizador = RenderizadorVistaPrevia(label, frecuencia=float('inf'))
+
+    def reutilizable(frame):
+        renderizador._ultimo = 0.0
+        renderizador.renderizar(frame)
+
+    for nombre, funcion in (("original", original), ("reutilizable", reutilizable)):
+        funcion(muestras[0])
+        # Reservado antes de medir para que la memoria reportada sea solo la del renderizado
+        tiempos = np.empty(frames)
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        for i in range(frames):
+            inicio = time.perf_counter()
+            funcion(muestras[i % len(muestras)])
+            tiempos[i] = (time.perf_counter() - inicio) * 1000
+        actual, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        tiempos = tiempos.tolist()
+        print(f"{nombre:<13} p50 {percentil(tiempos, 50):.3f} ms  p95 {percentil(tiempos, 95):.3f} ms  "
+              f"crecimiento {(actual - base) / 1024:.1f} KB  pico {(pico - base) / 1024:.0f} KB")
+
+    if root is None:
+        print("Sin pantalla: no se midió PhotoImage")
+    else:
+        root.destroy()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sistema de Registro Escolar")
+    parser.add_argument("--sin-metricas", action="store_true",
+                        help="Desactivar la instrumentación de las rutas críticas")
+    subparsers = parser.add_subparsers(dest="comando")
+
+    bench = subparsers.add_parser("benchmark-indice",
+                                  help="Latencia de búsqueda del índice de credenciales")
+    bench.add_argument("--alumnos", type=int, default=50000)
+    bench.add_argument("--busquedas", type=int, default=100000)
+
+    subparsers.add_parser("benchmark-migraciones",
+                          help="Costo de aplicar el esquema en frío y en caliente")
+
+    importar = subparsers.add_parser("importar", help="Importar alumnos desde CSV o XLSX")
+    importar.add_argument("archivo")
+    importar.add_argument("--fotos", help="Carpeta con las fotografías de la columna 'foto'")
+    importar.add_argument("--lote", type=int, default=TAMANO_LOTE_IMPORTACION)
+    importar.add_argument("--procesos", type=int, default=None)
+
+    exportar = subparsers.add_parser("exportar",
+                                     help="Exportar alumnos, eventos o asistencia a CSV, JSONL o Parquet")
+    exportar.add_argument("salida", help="Archivo .csv, .jsonl o .parquet")
+    exportar.add_argument("--conjunto", choices=list(CONJUNTOS_EXPORTACION), default='alumnos')
+    exportar.add_argument("--formato", choices=FORMATOS_EXPORTACION,
+                          help="Por defecto se deduce de la extensión")
+    exportar.add_argument("--nivel", default="")
+    exportar.add_argument("--grado", default="")
+    exportar.add_argument("--grupo", default="")
+    exportar.add_argument("--desde", default="", help="Fecha inicial AAAA-MM-DD (eventos y asistencia)")
+    exportar.add_argument("--hasta", default="", help="Fecha final AAAA-MM-DD (eventos y asistencia)")
+    exportar.add_argument("--sin-fotos", action="store_true", help="Omitir la columna foto_hash")
+    exportar.add_argument("--carpeta-fotos", help="Copiar cada fotografía una vez, nombrada por su hash")
+    exportar.add_argument("--bloque", type=int, default=TAMANO_BLOQUE_EXPORTACION)
+
+    subparsers.add_parser("verificar-ocupacion",
+                          help="Reconstruir los contadores de ocupación por grupo")
+
+    asistencia = subparsers.add_parser("asistencia",
+                                       help="Actualizar los resúmenes diarios y mostrar la presencia por grupo")
+    asistencia.add_argument("--fecha", help="Día a mostrar (AAAA-MM-DD); por defecto hoy")
+    asistencia.add_argument("--reconstruir", action="store_true",
+                            help="Recalcular los resúmenes desde todos los eventos")
+    asistencia.add_argument("--nivel", default="", help="Listar por alumno la asistencia del nivel")
+    asistencia.add_argument("--grado", default="")
+    asistencia.add_argument("--grupo", default="")
+
+    bench = subparsers.add_parser("benchmark-busqueda",
+                                  help="Búsqueda por nombre con FTS5 contra LIKE")
+    bench.add_argument("--alumnos", type=int, default=100000)
+    bench.add_argument("--consultas", type=int, default=200)
+
+    bench = subparsers.add_parser("benchmark-consultas",
+                                  help="Caché de consultas por filtros: aciertos y latencia")
+    bench.add_argument("--alumnos", type=int, default=50000)
+    bench.add_argument("--consultas", type=int, default=2000)
+    bench.add_argument("--combinaciones", type=int, default=6)
+    bench.add_argument("--altas-cada", type=int, default=50)
+
+    generar = subparsers.add_parser("generar-datos",
+                                    help="Llenar una base con alumnos y eventos sintéticos")
+    generar.add_argument("ruta", help="Archivo de base de datos a llenar (se crea si no existe)")
+    generar.add_argument("--alumnos", type=int, default=2000)
+    generar.add_argument("--dias", type=int, default=20)
+    generar.add_argument("--semilla", type=int, default=0)
+    generar.add_argument("--sin-fotos", action="store_true")
+
+    carga = subparsers.add_parser("prueba-carga",
+                                  help="Registro, escaneo y consulta sin interfaz sobre datos sintéticos")
+    carga.add_argument("--alumnos", type=int, default=2000)
+    carga.add_argument("--dias", type=int, default=20)
+    carga.add_argument("--registros", type=int, default=100)
+    carga.add_argument("--escaneos", type=int, default=5000)
+    carga.add_argument("--consultas", type=int, default=1000)
+    carga.add_argument("--semilla", type=int, default=0)
+    carga.add_argument("--sin-fotos", action="store_true")
+    carga.add_argument("--ruta", help="Base de datos a usar; por defecto una temporal que se borra")
+    carga.add_argument("--salida", help="Guardar los resultados en JSON")
+    carga.add_argument("--referencia", help="Resultados JSON anteriores; termina con error si hay regresiones")
+    carga.add_argument("--tolerancia", type=float, default=TOLERANCIA_REGRESION)
+
+    bench = subparsers.add_parser("benchmark-arranque",
+                                  help="Tiempo hasta la pantalla de login, con presupuesto")
+    bench.add_argument("--repeticiones", type=int, default=5)
+    bench.add_argument("--presupuesto-ms", type=int, default=PRESUPUESTO_ARRANQUE_MS)
+    subparsers.add_parser("medir-arranque", help="Uso interno de benchmark-arranque")
+
+    credenciales = subparsers.add_parser("credenciales",
+                                         help="Exportar credenciales QR de un nivel, grado o grupo")
+    credenciales.add_argument("salida", help="Archivo .pdf o .png (una imagen por hoja)")
+    credenciales.add_argument("--nivel", required=True)
+    credenciales.add_argument("--grado", default="")
+    credenciales.add_argument("--grupo", default="")
+    credenciales.add_argument("--procesos", type=int, default=None)
+
+    bench = subparsers.add_parser("benchmark-decodificacion",
+                                  help="Rendimiento de los decodificadores sobre frames sintéticos o un video")
+    bench.add_argument("--decodificadores", nargs="+", choices=list(DECODIFICADORES),
+                       default=list(DECODIFICADORES))
+    bench.add_argument("--resoluciones", nargs="+", default=["320x240", "480x360", "640x480"])
+    bench.add_argument("--frames", type=int, default=100)
+    bench.add_argument("--video", help="Grabación a reproducir en lugar de frames sintéticos")
+
+    bench = subparsers.add_parser("benchmark-vista-previa",
+                                  help="Tiempo y memoria por frame de la vista previa de la cámara")
+    bench.add_argument("--frames", type=int, default=3000)
+
+    bench = subparsers.add_parser("benchmark-sqlite",
+                                  help="Rendimiento de inserción y consulta por perfil de SQLite")
+    bench.add_argument("--filas", type=int, default=20000)
+    bench.add_argument("--consultas", type=int, default=5000)
+    bench.add_argument("--lote", type=int, default=100)
+
+    args = parser.parse_args(argv)
+    if args.sin_metricas:
+        METRICAS.activas = False
+
+    if args.comando == "benchmark-indice":
+        benchmark_indice(args.alumnos, args.busquedas)
+        return
+    if args.comando == "benchmark-migraciones":
+        benchmark_migraciones()
+        return
+    if args.comando == "importar":
+        importar_desde_cli(args.archivo, args.fotos, args.lote, args.procesos)
+        return
+    if args.comando == "exportar":
+        exportar_desde_cli(args.salida, args.conjunto, args.formato, args.nivel, args.grado, args.grupo,
+                           args.desde, args.hasta, 'omitir' if args.sin_fotos else 'referencia',
+                           args.carpeta_fotos, args.bloque)
+        return
+    if args.comando == "verificar-ocupacion":
+        verificar_ocupacion_desde_cli()
+        return
+    if args.comando == "asistencia":
+        asistencia_desde_cli(args.fecha, args.reconstruir, args.nivel, args.grado, args.grupo)
+        return
+    if args.comando == "benchmark-busqueda":
+        benchmark_busqueda(args.alumnos, args.consultas)
+        return
+    if args.comando == "benchmark-consultas":
+        benchmark_consultas(args.alumnos, args.consultas, args.combinaciones, args.altas_cada)
+        return
+    if args.comando == "generar-datos":
+        generar_datos_desde_cli(args.ruta, args.alumnos, args.dias, args.semilla, not args.sin_fotos)
+        return
+    if args.comando == "prueba-carga":
+        sys.exit(prueba_carga_desde_cli(args.alumnos, args.dias, args.registros, args.escaneos,
+                                        args.consultas, args.semilla, not args.sin_fotos, args.ruta,
+                                        args.salida, args.referencia, args.tolerancia))
+    if args.comando == "benchmark-arranque":
+        benchmark_arranque(args.repeticiones, args.presupuesto_ms)
+        return
+    if args.comando == "medir-arranque":
+        medir_arranque()
+        return
+    if args.comando == "credenciales":
+        credenciales_desde_cli(args.salida, args.nivel, args.grado, args.grupo, args.procesos)
+        return
+    if args.comando == "benchmark-decodificacion":
+        resoluciones = [tuple(int(v) for v in r.lower().split("x")) for r in args.resoluciones]
+        benchmark_decodificacion(args.decodificadores, resoluciones, args.frames, args.video)
+        return
+    if args.comando == "benchmark-vista-previa":
+        benchmark_vista_previa(args.frames)
+        return
+    if args.comando == "benchmark-sqlite":
+        benchmark_sqlite(args.filas, args.consultas, args.lote)
+        return
 
-if __name__ == "__main__":
     root = tk.Tk()
     app = SistemaRegistroEscolar(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file